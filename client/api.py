@@ -12,21 +12,36 @@
 
     add_node(node): Send POST request to add node to the orchestrated topology.
 
+    add_node_async(node): Same as add_node(node), but without blocking the 
+    caller.
+
     delete_node(id): Send DELETE request to delete node from the orchestrated 
     topology.
 
     update_node_specs(node): Send PUT request to update node specs (including 
     interface specs).
 
+    update_node_specs_async(node, partial): Same as update_node_specs(node), 
+    but without blocking the caller (and optionally only with the specs that 
+    changed since the last update).
+
     add_request(req): Send POST request to add req to Requests database.
 
+    add_request_async(req): Same as add_request(req), but without blocking 
+    the caller.
+
     add_iperf3_listeners(node): Send POST request to add iPerf3 listeners.
 
+    add_iperf3_listeners_async(node): Same as add_iperf3_listeners(node), but 
+    without blocking the caller.
+
     get_iperf3_target(node, iface): Send GET request to get iPerf3 target for 
     given interface.
 
     delete_iperf3_listeners(node): Send DELETE request to delete iPerf3 
     listeners.
+
+    close(): Close the persistent connection(s) to the orchestrator.
 '''
 
 
@@ -36,15 +51,33 @@
 
 
 from os import getenv
-from requests import get, post, put, delete
-from html.parser import HTMLParser
+from atexit import register
+from functools import lru_cache
+from time import sleep, monotonic
+from queue import Queue
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor, Future
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from re import compile
+from json import dumps, loads
+from socket import (IPPROTO_TCP, TCP_NODELAY, SOL_SOCKET, SO_KEEPALIVE,
+                    SO_SNDBUF)
+from html import unescape
 
 from model import Node, Request, Interface
 from common import SERVER_IP
-from consts import HTTP_EXISTS, HTTP_SUCCESS
+from consts import HTTP_EXISTS, HTTP_SUCCESS, HTTP_NOT_FOUND
 from logger import console, file
 from utils import all_exit
 
+# orjson (if installed) encodes and decodes faster than the json module
+try:
+    from orjson import dumps as _dumps, loads
+except ImportError:
+    _dumps = None
+
 
 try:
     API_PORT = int(getenv('SERVER_API_PORT', None))
@@ -53,6 +86,20 @@ except:
     file.exception('Server API port invalid or missing')
     all_exit()
 
+try:
+    # time during which the received configuration is considered fresh
+    CONFIG_TTL = float(getenv('CONFIG_TTL_S', None))
+except:
+    CONFIG_TTL = 30
+
+try:
+    # max number of connections kept open to the orchestrator
+    API_MAX_CONNECTIONS = int(getenv('SERVER_API_MAX_CONNECTIONS', None))
+    if API_MAX_CONNECTIONS < 1:
+        raise ValueError
+except:
+    API_MAX_CONNECTIONS = 4
+
 
 # ====================
 #     MAIN METHODS
@@ -62,7 +109,8 @@ except:
 def get_config():
     '''
         Send GET request to get the configuration of the protocol, the 
-        simulation, etc.
+        simulation, etc. The configuration is cached for CONFIG_TTL seconds 
+        (set through the CONFIG_TTL_S environment variable, default is 30s).
 
         Returns (json, code, msg), where json is dict.
     '''
@@ -80,6 +128,18 @@ def add_node(node: Node):
     return _ryu_add_node(node)
 
 
+def add_node_async(node: Node):
+    '''
+        Send POST request to add node to the orchestrated topology in the 
+        background, without blocking the caller.
+
+        Returns Future whose result is (state, code, msg), where state is True 
+        if added, False if not.
+    '''
+
+    return _ryu_add_node(node, _async=True)
+
+
 def delete_node(node: Node):
     '''
         Send DELETE request to delete node from the orchestrated topology.
@@ -102,6 +162,28 @@ def update_node_specs(node: Node):
     return _ryu_update_node_specs(node)
 
 
+def update_node_specs_async(node: Node, partial: bool = False):
+    '''
+        Send PUT request to update node specs (including interface specs) in 
+        the background, without blocking the caller.
+
+        At most one update is in flight per node: if one is already in 
+        flight, the new specs are sent once it completes (replacing any 
+        specs that were waiting), and the in-flight update's Future is 
+        returned.
+
+        If partial is True, only the specs that changed since the last update 
+        are sent (with 'partial' set to True, and a 'seq' number), except if 
+        replacing waiting specs (then all specs are sent). The orchestrator 
+        must support it.
+
+        Returns Future whose result is (state, code, msg), where state is True 
+        if updated, False if not.
+    '''
+
+    return _ryu_update_node_specs(node, _async=True, partial=partial)
+
+
 def add_request(req: Request):
     '''
         Send POST request to add req to Requests database.
@@ -112,6 +194,18 @@ def add_request(req: Request):
     return _ryu_add_request(req)
 
 
+def add_request_async(req: Request):
+    '''
+        Send POST request to add req to Requests database in the background, 
+        without blocking the caller.
+
+        Returns Future whose result is (state, code, msg), where state is True 
+        if added, False if not.
+    '''
+
+    return _ryu_add_request(req, _async=True)
+
+
 def add_iperf3_listeners(node: Node):
     '''
         Send POST request to add iPerf3 listeners.
@@ -122,6 +216,18 @@ def add_iperf3_listeners(node: Node):
     return _ryu_add_iperf3_listeners(node)
 
 
+def add_iperf3_listeners_async(node: Node):
+    '''
+        Send POST request to add iPerf3 listeners in the background, without 
+        blocking the caller.
+
+        Returns Future whose result is (state, code, msg), where state is True 
+        if added, False if not.
+    '''
+
+    return _ryu_add_iperf3_listeners(node, _async=True)
+
+
 def get_iperf3_target(node: Node, iface: Interface):
     '''
         Send GET request to get iPerf3 target for given interface.
@@ -143,6 +249,14 @@ def delete_iperf3_listeners(node: Node):
     return _ryu_delete_iperf3_listeners(node)
 
 
+def close():
+    '''
+        Close the persistent connection(s) to the orchestrator.
+    '''
+
+    return _ryu_close()
+
+
 # ===============
 #     RYU API
 # ===============
@@ -150,79 +264,357 @@ def delete_iperf3_listeners(node: Node):
 
 RYU_URL = 'http://' + SERVER_IP + ':' + str(API_PORT)
 RYU_HEADERS = {'content-type': 'application/json'}
+RYU_TIMEOUT = (1, 5)  # (connect, read) in seconds
+
+# max number of connections open to the orchestrator at any time (concurrent
+# calls beyond that wait for a pooled connection to be released instead of
+# opening throwaway ones)
+RYU_MAX_CONNECTIONS = API_MAX_CONNECTIONS
+
+# options of pooled sockets: no Nagle buffering of small JSON bodies, kernel
+# keep-alive probes so dead idle connections are detected, and a send buffer
+# large enough for a whole batch body to be written at once
+RYU_SNDBUF = 262144
+RYU_SOCKET_OPTIONS = [(IPPROTO_TCP, TCP_NODELAY, 1),
+                      (SOL_SOCKET, SO_KEEPALIVE, 1),
+                      (SOL_SOCKET, SO_SNDBUF, RYU_SNDBUF)]
+
+
+class _RyuAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = RYU_SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
+# persistent session to reuse keep-alive connections to the orchestrator
+# instead of opening a new one on every call
+_session = Session()
+_session.headers.update(RYU_HEADERS)
+_adapter = _RyuAdapter(
+    pool_connections=4, pool_maxsize=RYU_MAX_CONNECTIONS, pool_block=True,
+    max_retries=Retry(total=3, backoff_factor=0.1,
+                      status_forcelist=[502, 503, 504]))
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+# background workers for requests whose reply the caller doesn't wait for
+# (they share the session's connection pool, so they are sent in parallel
+# over already open connections)
+RYU_WORKERS = 8
+
+# background requests queued within the same interval are coalesced into a
+# single POST /batch (if the orchestrator doesn't support it, they are sent
+# one by one, right away)
+RYU_BATCH_INTERVAL = 0.05  # in seconds
+_batch_supported = True
+
+# queue of background requests, its flusher thread and the workers (started
+# by _ryu_open on first use, and again after _ryu_close)
+_batch_queue = None
+_flusher = None
+_executor = None
+_closed = True
+_open_lock = Lock()
+
+# last specs acknowledged by the orchestrator per node (partial updates are
+# diffed against them), and number of partial updates sent per node (so the
+# orchestrator can detect a missing one)
+_last_specs = {}
+_partial_seqs = {}
+
+# background specs updates in flight (keys are node IDs, values are lists of
+# the update's Future, and the newest specs waiting to be sent, if any, both
+# encoded and as dict)
+_inflight_specs = {}
+_inflight_lock = Lock()
+
+# last successfully received configuration and time of reception (replaced
+# as a whole tuple, so concurrent callers never see a torn update)
+_config_cache = (None, 0.0)
+
+
+# to extract the text of HTML (error) bodies
+_TAG_RE = compile(r'<[^>]+>')
+
+
+def _strip(text: str):
+    return unescape(_TAG_RE.sub('', text))
+
+
+# method must be uppercase (GET, POST, PUT, DELETE), and
+# data must be already encoded (see _encode)
+def _ryu_request(method: str, path: str, data: bytes = None):
+    try:
+        r = _session.request(method, RYU_URL + path, data=data,
+                             timeout=RYU_TIMEOUT)
+        code = r.status_code
+        msg = r.text
+        if r.headers.get('content-type', '').startswith('text/html'):
+            msg = _strip(msg)
+        if method == 'GET':
+            json = None
+            if code == HTTP_SUCCESS:
+                try:
+                    json = loads(r.content)
+                except:
+                    pass
+            return json, code, msg
+        return ((code == HTTP_SUCCESS or code == HTTP_EXISTS), code, msg)
+    except Exception as e:
+        file.exception(e.__class__.__name__)
+        return None, None, e.__class__.__name__
 
 
-class _HTML(HTMLParser):
-    text = ''
+def _ryu_submit(method: str, path: str, data: bytes = None):
+    future = Future()
+    with _open_lock:
+        if _closed:
+            _ryu_open()
+        _batch_queue.put((method, path, data, future))
+    return future
+
+
+# start flushing background requests (called with _open_lock held)
+def _ryu_open():
+    global _batch_queue, _flusher, _executor, _closed
+    _batch_queue = Queue()
+    _executor = ThreadPoolExecutor(max_workers=RYU_WORKERS,
+                                   thread_name_prefix='ryu')
+    _flusher = Thread(target=_ryu_flush, args=(_batch_queue, _executor),
+                      daemon=True)
+    _flusher.start()
+    _closed = False
+
+
+def _ryu_flush(queue: Queue, executor: ThreadPoolExecutor):
+    stop = False
+    while not stop:
+        ops = [queue.get()]
+        if _batch_supported:
+            sleep(RYU_BATCH_INTERVAL)
+        while not queue.empty():
+            ops.append(queue.get())
+        # None is queued by _ryu_close to stop flushing
+        stop = None in ops
+        ops = [op for op in ops if op != None]
+        try:
+            if len(ops) > 1 and _ryu_batch(ops):
+                continue
+            for method, path, data, future in ops:
+                # (ops already resolved from a batch are not sent again)
+                if future.done():
+                    continue
+                try:
+                    executor.submit(_ryu_resolve, future, method, path, data)
+                except RuntimeError:
+                    # workers shut down (e.g. at interpreter exit), so the
+                    # request is sent from this thread
+                    _ryu_resolve(future, method, path, data)
+        except Exception as e:
+            file.exception(e.__class__.__name__)
+            for *_, future in ops:
+                if not future.done():
+                    future.set_exception(e)
+
+
+def _ryu_resolve(future: Future, method: str, path: str, data: bytes = None):
+    if not future.done():
+        future.set_result(_ryu_request(method, path, data))
+
+
+def _ryu_batch(ops: list):
+    global _batch_supported
+    if not _batch_supported:
+        return False
+    try:
+        # already encoded data is spliced into the batch as is
+        r = _session.post(RYU_URL + '/batch', data=(
+            b'{"ops":[' + b','.join(
+                _encode({'method': method, 'path': path})[:-1] +
+                b',"data":' + (data or b'null') + b'}'
+                for method, path, data, _ in ops) + b']}'),
+            timeout=RYU_TIMEOUT)
+        if r.status_code == HTTP_NOT_FOUND:
+            _batch_supported = False
+            return False
+        if r.status_code != HTTP_SUCCESS:
+            return False
+        # results are demultiplexed by index as (code, msg) pairs (if they
+        # don't match the ops, none is resolved and ops are sent one by one)
+        results = loads(r.content)['results']
+        if len(results) != len(ops):
+            return False
+        for (*_, future), (code, msg) in zip(ops, results):
+            if not future.done():
+                future.set_result(
+                    ((code == HTTP_SUCCESS or code == HTTP_EXISTS), code, msg))
+        return True
+    except Exception as e:
+        file.exception(e.__class__.__name__)
+        return False
 
-    def handle_data(self, data):
-        self.text += data
 
-    def get(self, text):
-        self.feed(text)
-        msg = self.text
-        self.text = ''
-        return msg
+# node IDs (and interface names) don't change during a node's lifetime, so
+# their URL paths are only built once
+@lru_cache(maxsize=1024)
+def _path(*parts):
+    return '/' + '/'.join(str(part) for part in parts)
 
 
-_html = _HTML()
+def _ryu_get_config():
+    global _config_cache
+    conf, ts = _config_cache
+    if conf != None and monotonic() - ts < CONFIG_TTL:
+        return conf
+    conf = _ryu_request('GET', '/config')
+    if conf[0] != None:
+        _config_cache = (conf, monotonic())
+    return conf
 
 
-def _ryu_request(method: str, path: str, data: dict = {}):
-    try:
-        url = RYU_URL + path
-        method = method.upper()
-        if method == 'GET':
-            r = get(url, headers=RYU_HEADERS, json=data)
-            code = r.status_code
-            msg = _html.get(r.text)
-            try:
-                json = r.json()
-            except:
-                json = None
-            return (json, code, msg) if (
-                code == HTTP_SUCCESS) else (None, code, msg)
-        elif method == 'POST':
-            r = post(url, headers=RYU_HEADERS, json=data)
-        elif method == 'PUT':
-            r = put(url, headers=RYU_HEADERS, json=data)
-        elif method == 'DELETE':
-            r = delete(url, headers=RYU_HEADERS, json=data)
-        code = r.status_code
-        msg = _html.get(r.text)
-        return ((code == HTTP_SUCCESS or code == HTTP_EXISTS), code, msg)
-    except Exception as e:
-        file.exception(e.__class__.__name__)
-        return None, None, e.__class__.__name__
+def _ryu_add_node(node: Node, _async: bool = False):
+    return (_ryu_submit if _async else _ryu_request)(
+        'POST', '/node', _encode(_node_payload(node)))
 
 
-def _ryu_get_config():
-    return _ryu_request('get', '/config')
+def _ryu_delete_node(node: Node):
+    return _ryu_request('DELETE', _path('node', node.id))
+
+
+def _ryu_update_node_specs(node: Node, _async: bool = False,
+                           partial: bool = False):
+    path = _path('node_specs', node.id)
+    specs = _node_specs_payload(node)
+    if not _async:
+        ret = _ryu_request('PUT', path, _encode(specs))
+        if ret[0]:
+            _last_specs[node.id] = specs
+        return ret
+    with _inflight_lock:
+        inflight = _inflight_specs.get(node.id, None)
+        if inflight:
+            # coalesce with the update in flight (with all specs, since the
+            # ones replaced may have had changes that these don't)
+            inflight[1] = _encode(specs)
+            inflight[2] = specs
+            return inflight[0]
+        payload = specs
+        last = _last_specs.get(node.id, None)
+        if partial and last:
+            payload = _partial_specs_payload(node.id, last, specs)
+        future = _ryu_submit('PUT', path, _encode(payload))
+        _inflight_specs[node.id] = [future, None, None]
+    future.add_done_callback(
+        lambda future: _ryu_update_node_specs_done(node.id, specs, future))
+    return future
+
+
+def _ryu_update_node_specs_done(node_id, specs: dict, future: Future):
+    with _inflight_lock:
+        # specs become the baseline of partial updates only once the
+        # orchestrator has acknowledged them
+        if (not future.cancelled() and future.exception() == None
+                and future.result()[0]):
+            _last_specs[node_id] = specs
+        _, payload, specs = _inflight_specs.pop(node_id)
+        if payload == None:
+            return
+        # newer specs arrived while the previous update was in flight
+        future = _ryu_submit('PUT', _path('node_specs', node_id), payload)
+        _inflight_specs[node_id] = [future, None, None]
+    future.add_done_callback(
+        lambda future: _ryu_update_node_specs_done(node_id, specs, future))
+
+
+def _ryu_add_request(req: Request, _async: bool = False):
+    return (_ryu_submit if _async else _ryu_request)(
+        'POST', '/request', _encode(_request_payload(req)))
+
+
+def _ryu_add_iperf3_listeners(node: Node, _async: bool = False):
+    listeners = {name: iface._iperf3_ip
+                 for name, iface in node.interfaces.items()}
+    listeners['_default_iperf3_ip'] = node._default_iperf3_ip
+    return (_ryu_submit if _async else _ryu_request)(
+        'POST', _path('iperf3', node.id), _encode(listeners))
+
+
+def _ryu_get_iperf3_target(node: Node, iface: Interface):
+    return _ryu_request('GET', _path('iperf3', node.id, iface.name))
+
 
+def _ryu_delete_iperf3_listeners(node: Node):
+    return _ryu_request('DELETE', _path('iperf3', node.id))
 
-def _ryu_add_node(node: Node):
-    return _ryu_request('post', '/node', {
+
+def _ryu_close():
+    # let pending background requests finish before closing connections
+    # (background requests made afterwards, e.g. after connecting again,
+    # start flushing again)
+    global _closed
+    with _open_lock:
+        flusher = None
+        if not _closed:
+            _closed = True
+            flusher, executor = _flusher, _executor
+            _batch_queue.put(None)
+    if flusher:
+        flusher.join()
+        executor.shutdown(wait=True)
+    _session.close()
+
+
+# connections are also closed if the process exits without disconnecting
+# (e.g. through all_exit)
+register(_ryu_close)
+
+
+# payloads are encoded as compact JSON bytes on the caller's thread, so
+# background workers only do socket I/O
+def _encode(payload):
+    if _dumps:
+        return _dumps(payload)
+    return dumps(payload, separators=(',', ':')).encode()
+
+
+# payload builders (built once per call on the caller's thread, so a queued
+# background request carries a consistent snapshot of the object)
+
+
+def _node_payload(node: Node):
+    return {
         'id': node.id,
         'state': node.state,
-        'type': node.type.value,
+        'type': node.type,
         'label': node.label,
         'main_interface': node.main_interface,
         'threshold': node.threshold,
-        'interfaces': [{
-            'name': iface.name,
-            'num': iface.num,
-            'mac': iface.mac,
-            'ipv4': iface.ipv4
-        } for iface in node.interfaces.values()]
-    })
+        'interfaces': _static_ifaces_payload(node)
+    }
 
 
-def _ryu_delete_node(node: Node):
-    return _ryu_request('delete', '/node/' + str(node.id))
+# static part of interfaces (name, number, MAC, IP) is only built again if the
+# node's interfaces change (keys are node IDs)
+_static_ifaces = {}
+
+
+def _static_ifaces_payload(node: Node):
+    names = tuple(node.interfaces)
+    cached = _static_ifaces.get(node.id, None)
+    if cached and cached[0] == names:
+        return cached[1]
+    payload = [{
+        'name': iface.name,
+        'num': iface.num,
+        'mac': iface.mac,
+        'ipv4': iface.ipv4
+    } for iface in node.interfaces.values()]
+    _static_ifaces[node.id] = (names, payload)
+    return payload
 
 
-def _ryu_update_node_specs(node: Node):
-    return _ryu_request('put', '/node_specs/' + str(node.id), {
+def _node_specs_payload(node: Node):
+    return {
         'cpu_count': node.get_cpu_count(),
         'cpu_free': node.get_cpu_free(),
         'memory_total': node.get_memory_total(),
@@ -230,24 +622,48 @@ def _ryu_update_node_specs(node: Node):
         'disk_total': node.get_disk_total(),
         'disk_free': node.get_disk_free(),
         'timestamp': node.get_timestamp(),
-        'interfaces': [{
-            'name': iface.name,
-            'capacity': iface.get_capacity(),
-            'bandwidth_up': iface.get_bandwidth_up(),
-            'bandwidth_down': iface.get_bandwidth_down(),
-            'tx_packets': iface.get_tx_packets(),
-            'rx_packets': iface.get_rx_packets(),
-            'tx_bytes': iface.get_tx_bytes(),
-            'rx_bytes': iface.get_rx_bytes(),
-            '_recv_bps': iface._recv_bps,
-            'timestamp': iface.get_timestamp()
-        } for iface in node.interfaces.values()]
-    })
-
-
-def _ryu_add_request(req: Request):
+        'interfaces': [_iface_specs_payload(iface)
+                       for iface in node.interfaces.values()]
+    }
+
+
+# only the specs that changed since last (interfaces are identified by name)
+def _partial_specs_payload(node_id, last: dict, specs: dict):
+    payload = {key: val for key, val in specs.items()
+               if key != 'interfaces' and last.get(key, None) != val}
+    last_ifaces = {iface['name']: iface for iface in last['interfaces']}
+    payload['interfaces'] = []
+    for iface in specs['interfaces']:
+        last_iface = last_ifaces.get(iface['name'], {})
+        changed = {key: val for key, val in iface.items()
+                   if last_iface.get(key, None) != val}
+        if changed:
+            changed['name'] = iface['name']
+            payload['interfaces'].append(changed)
+    _partial_seqs[node_id] = _partial_seqs.get(node_id, 0) + 1
+    payload['partial'] = True
+    payload['seq'] = _partial_seqs[node_id]
+    return payload
+
+
+def _iface_specs_payload(iface: Interface):
+    return {
+        'name': iface.name,
+        'capacity': iface.get_capacity(),
+        'bandwidth_up': iface.get_bandwidth_up(),
+        'bandwidth_down': iface.get_bandwidth_down(),
+        'tx_packets': iface.get_tx_packets(),
+        'rx_packets': iface.get_rx_packets(),
+        'tx_bytes': iface.get_tx_bytes(),
+        'rx_bytes': iface.get_rx_bytes(),
+        '_recv_bps': iface._recv_bps,
+        'timestamp': iface.get_timestamp()
+    }
+
+
+def _request_payload(req: Request):
     from network import MY_IP
-    return _ryu_request('post', '/request', {
+    return {
         'id': req.id,
         'src': MY_IP,
         'cos_id': req.cos.id,
@@ -272,21 +688,5 @@ def _ryu_add_request(req: Request):
                 'disk': response.disk,
                 'timestamp': response.timestamp,
             } for response in attempt.responses.values()]
-        } for attempt in req.attempts.values()]
-    })
-
-
-def _ryu_add_iperf3_listeners(node: Node):
-    listeners = {name: iface._iperf3_ip
-                 for name, iface in node.interfaces.items()}
-    listeners['_default_iperf3_ip'] = node._default_iperf3_ip
-    return _ryu_request('post', '/iperf3/' + str(node.id), listeners)
-
-
-def _ryu_get_iperf3_target(node: Node, iface: Interface):
-    return _ryu_request('get',
-                        '/iperf3/' + str(node.id) + '/' + str(iface.name))
-
-
-def _ryu_delete_iperf3_listeners(node: Node):
-    return _ryu_request('delete', '/iperf3/' + str(node.id))
+        } for attempt in req.attempts]
+    }
@@ -36,81 +36,86 @@
 '''
 
 
+# heavy modules (manager, flask, gui, etc.) are only imported once the mode
+# is known and only if it needs them, to keep startup (and --help) fast
+
+
 from os import environ
 from threading import Thread
 from argparse import ArgumentParser
+from functools import lru_cache
 from atexit import register as at_exit
 from signal import signal, SIGINT
 from logging import getLogger, INFO, WARNING
-from flask import cli
 from ipaddress import ip_address
+from re import compile
 
-from manager import Manager
 from model import Node, CoS
 from utils import all_exit
-from netapp_cli import netapp_cli
-from logger import console, file
+from logger import console, file, set_console_level
 from consts import (MODE_CLIENT, MODE_RESOURCE, MODE_SWITCH,
                     SEND_TO_BROADCAST, SEND_TO_ORCHESTRATOR)
 
 
-# disable flask console messages
-getLogger('werkzeug').disabled = True
-cli.show_server_banner = lambda *_: None
-
-# cli options parser
-parser = ArgumentParser()
+# canonical IPv4 address (no leading zeros)
+_IPV4_RE = compile(r'((25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])\.){3}'
+                   r'(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])')
+
+# cli options (flags, kwargs) shared by modes
+_SERVER = (('-s', '--server'), dict(
+    metavar='server', required=True,
+    help='Server IP and API port. Format is IP:PORT.'))
+_ID = (('-i', '--id'), dict(
+    metavar='id', default=None, help='Custom node ID (for simulations).'))
+_LABEL = (('-l', '--label'), dict(
+    metavar='label', default=None,
+    help='Custom node label (for simulations).'))
+_IPERF3 = (('-p3', '--iperf3'), dict(
+    metavar='iperf3', default=None, help='iPerf3 (client, server, dual).'))
+_VERBOSE = (('-v', '--verbose'), dict(
+    metavar='verbose', default=False, nargs='?', const=True,
+    help='Detailed output on the console.'))
+
+# cli options of each mode
+_MODES_ARGS = {
+    MODE_SWITCH: ('Connect as switch.', (
+        (('-d', '--dpid'), dict(
+            metavar='dpid', required=True,
+            help='Bridge datapath ID (in hexadecimal).')),
+        _SERVER, _IPERF3, _VERBOSE)),
+    MODE_CLIENT: ('Connect as client.', (
+        _SERVER, _ID, _LABEL, _IPERF3, _VERBOSE)),
+    MODE_RESOURCE: ('Connect as resource.', (
+        _SERVER, _ID, _LABEL,
+        (('-m', '--limit'), dict(
+            metavar='limit', default=None,
+            help='Resource usage limit percentage (%%).')),
+        (('-c', '--cpu'), dict(
+            metavar='cpu', default=None, help='Number of simulated CPUs.')),
+        (('-r', '--ram'), dict(
+            metavar='ram', default=None,
+            help='Size of simulated RAM (in MB).')),
+        (('-d', '--disk'), dict(
+            metavar='disk', default=None,
+            help='Size of simulated disk (in GB).')),
+        _IPERF3, _VERBOSE)),
+}
+
+
+# cli options parser (built once)
+@lru_cache(maxsize=1)
+def _get_parser():
+    parser = ArgumentParser()
+    subparsers = parser.add_subparsers(dest='mode')
+    for mode, (help, args) in _MODES_ARGS.items():
+        mode_parser = subparsers.add_parser(mode, help=help)
+        for flags, kwargs in args:
+            mode_parser.add_argument(*flags, **kwargs)
+    return parser
 
 
 def _parse_arguments():
-    subparsers = parser.add_subparsers(dest='mode')
-    # switch mode
-    s_parser = subparsers.add_parser(MODE_SWITCH, help='Connect as switch.')
-    s_parser.add_argument('-d', '--dpid', metavar='dpid', required=True,
-                          help='Bridge datapath ID (in hexadecimal).')
-    s_parser.add_argument('-s', '--server', metavar='server', required=True,
-                          help='Server IP and API port. Format is IP:PORT.')
-    s_parser.add_argument('-p3', '--iperf3', metavar='iperf3', default=None,
-                          help='iPerf3 (client, server, dual).')
-    s_parser.add_argument('-v', '--verbose', metavar='verbose', default=False,
-                          nargs='?', const=True,
-                          help='Detailed output on the console.')
-    # client mode
-    c_parser = subparsers.add_parser(MODE_CLIENT, help='Connect as client.')
-    c_parser.add_argument('-s', '--server', metavar='server', required=True,
-                          help='Server IP and API port. Format is IP:PORT.')
-    c_parser.add_argument('-i', '--id', metavar='id', default=None,
-                          help='Custom node ID (for simulations).')
-    c_parser.add_argument('-l', '--label', metavar='label', default=None,
-                          help='Custom node label (for simulations).')
-    c_parser.add_argument('-p3', '--iperf3', metavar='iperf3', default=None,
-                          help='iPerf3 (client, server, dual).')
-    c_parser.add_argument('-v', '--verbose', metavar='verbose', default=False,
-                          nargs='?', const=True,
-                          help='Detailed output on the console.')
-    # resource mode
-    r_parser = subparsers.add_parser(
-        MODE_RESOURCE, help='Connect as resource.')
-    r_parser.add_argument('-s', '--server', metavar='server', required=True,
-                          help='Server IP and API port. Format is IP:PORT.')
-    r_parser.add_argument('-i', '--id', metavar='id', default=None,
-                          help='Custom node ID (for simulations).')
-    r_parser.add_argument('-l', '--label', metavar='label', default=None,
-                          help='Custom node label (for simulations).')
-    r_parser.add_argument('-m', '--limit', metavar='limit', default=None,
-                          help='Resource usage limit percentage (%).')
-    r_parser.add_argument('-c', '--cpu', metavar='cpu', default=None,
-                          help='Number of simulated CPUs.')
-    r_parser.add_argument('-r', '--ram', metavar='ram', default=None,
-                          help='Size of simulated RAM (in MB).')
-    r_parser.add_argument('-d', '--disk', metavar='disk', default=None,
-                          help='Size of simulated disk (in GB).')
-    r_parser.add_argument('-p3', '--iperf3', metavar='iperf3', default=None,
-                          help='iPerf3 (client, server, dual).')
-    r_parser.add_argument('-v', '--verbose', metavar='verbose', default=False,
-                          nargs='?', const=True,
-                          help='Detailed output on the console.')
-    return parser.parse_args()
+    return _get_parser().parse_args()
 
 
 def connect(mode: str, server: str, node: Node = None, verbose: bool = False,
@@ -151,15 +156,18 @@ def connect(mode: str, server: str, node: Node = None, verbose: bool = False,
     '''
 
     if mode not in (MODE_CLIENT, MODE_RESOURCE, MODE_SWITCH):
-        parser.print_help()
+        _get_parser().print_help()
         all_exit()
 
     # config console logger level
-    console.setLevel(INFO if verbose else WARNING)
+    set_console_level(INFO if verbose else WARNING)
 
     try:
         server_ip, server_api_port = server.split(':')
-        environ['SERVER_IP'] = ip_address(server_ip).exploded
+        if not _IPV4_RE.fullmatch(server_ip):
+            # not already in canonical dotted-quad form
+            server_ip = ip_address(server_ip).exploded
+        environ['SERVER_IP'] = server_ip
         environ['SERVER_API_PORT'] = str(int(server_api_port))
     except:
         console.error('Server format must be IP:PORT')
@@ -186,6 +194,7 @@ def connect(mode: str, server: str, node: Node = None, verbose: bool = False,
 
     environ['PROTOCOL_VERBOSE'] = str(verbose)
 
+    from manager import Manager
     mgr = Manager(node, verbose)
 
     # disconnect at exit
@@ -213,16 +222,22 @@ if __name__ == '__main__':
         connect(mode, args.server, verbose=args.verbose != False,
                 dpid=args.dpid, iperf3=args.iperf3)
     else:
-        parser.print_help()
+        _get_parser().print_help()
         all_exit()
 
     if mode in (MODE_CLIENT, MODE_RESOURCE):
         from protocol import PROTO_SEND_TO
         if PROTO_SEND_TO in (SEND_TO_BROADCAST, SEND_TO_ORCHESTRATOR):
+            from flask import cli
             from network import MY_IP
             from resources import get_resources
             from protocol import send_request
             from gui import app
+            from netapp_cli import netapp_cli
+
+            # disable flask console messages
+            getLogger('werkzeug').disabled = True
+            cli.show_server_banner = lambda *_: None
 
             # start gui
             app.logger.disabled = True
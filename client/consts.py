@@ -24,6 +24,7 @@ BROADCAST_MAC = 'ff:ff:ff:ff:ff:ff'
 DEFAULT_IP = '0.0.0.0'
 HTTP_SUCCESS = 200
 HTTP_EXISTS = 303
+HTTP_NOT_FOUND = 404
 SEND_TO_BROADCAST = 'BROADCAST'
 SEND_TO_ORCHESTRATOR = 'ORCHESTRATOR'
 SEND_TO_NONE = 'NONE'
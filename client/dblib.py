@@ -7,6 +7,8 @@
     --------
     insert(obj): Insert obj as a row in its corresponding database table. 
 
+    insert_many(cls, objs): Insert objs as rows in the database table of cls.
+
     update(obj): Update corresponding database table row from obj.
     
     select(cls, fields, groups, orders, as_obj, **kwargs): Select row(s) from 
@@ -15,6 +17,12 @@
     select_page(cls, page, page_size, fields, orders, as_obj, **kwargs): 
     Select page_size row(s) of page from the database table of cls.
 
+    select_after(cls, after, page_size, fields, keys, as_obj, **kwargs): 
+    Select page_size row(s) coming after the keys values in after from the 
+    database table of cls.
+
+    count(cls, max_age, **kwargs): Count rows in the database table of cls.
+
     as_csv(cls, abs_path, fields, orders, _suffix, **kwargs): Convert the 
     database table of cls to a CSV file.
 '''
@@ -30,6 +38,8 @@ from queue import Queue
 from threading import Thread, Event
 from sqlite3 import connect
 from csv import writer
+from functools import lru_cache
+from time import monotonic
 
 from model import Model, CoS, Request, Attempt, Response
 from network import MY_IP
@@ -62,6 +72,11 @@ _tables = {
 _queue = Queue()
 _rows = {}
 
+# row counts cached by (table, filters), with the time they were counted
+_counts = {}
+# default max age of cached row counts (in seconds)
+COUNT_MAX_AGE = 60
+
 
 # ====================
 #     MAIN METHODS
@@ -104,6 +119,40 @@ def insert(obj: Model):
         return False
 
 
+def insert_many(cls, objs):
+    '''
+        Insert objs (of class cls) as rows in the database table of cls, all 
+        at once.
+
+        Returns True if inserted, False if not.
+    '''
+
+    try:
+        rows = [_adapt(obj) for obj in objs]
+        if not rows:
+            return True
+        cols = _get_columns(cls)
+
+        event = Event()
+
+        global _queue
+        # a list of rows is executed as a batch
+        _queue.put((
+            'insert into {} {} values ({})'.format(
+                _tables[cls.__name__], str(cols), ','.join('?' * len(cols))),
+            rows,
+            event
+        ))
+
+        event.wait()
+        return True
+
+    except Exception as e:
+        console.error('%s %s', e.__class__.__name__, str(e))
+        file.exception(e.__class__.__name__)
+        return False
+
+
 def update(obj: Model, _id: tuple = ('id',)):
     '''
         Update corresponding database table row from obj.
@@ -148,6 +197,10 @@ def select(cls, fields: tuple = ('*',), groups: tuple = None,
 
             >>> select(CoS, fields=('id', 'name'), as_obj=False, id=('=', 1))
 
+        The 'in' condition takes an iterable of values. Example:
+
+            >>> select(CoS, fields=('id', 'name'), as_obj=False, id=('in', (1, 2)))
+
         as_obj should only be set to True if fields is (*).
 
         Returns list of rows if selected, None if not.
@@ -196,38 +249,66 @@ def select_page(cls, page: int, page_size: int, fields: tuple = ('*',),
         Returns list of rows if selected, None if not.
     '''
 
-    try:
-        where, vals = _get_where_str(**kwargs)
-        order_by = _get_orders_str(orders)
-        if not where:
-            where += ' where '
-        else:
-            where += ' and '
-        where += ' oid not in (select oid from {} {} limit {}) '.format(
-            _tables[cls.__name__], order_by, (page - 1) * page_size)
+    where, vals = _get_where_str(**kwargs)
+    return _select_range(cls, fields, where, vals, orders, page_size,
+                         (page - 1) * page_size, as_obj)
 
-        event = Event()
 
-        global _queue
-        _queue.put((
-            'select {} from {} {} limit {}'.format(
-                _get_fields_str(fields), _tables[cls.__name__],
-                where + order_by, page_size),
-            vals,
-            event
-        ))
+def select_after(cls, after: tuple, page_size: int, fields: tuple = ('*',),
+                 keys: tuple = ('id',), as_obj: bool = True, **kwargs):
+    '''
+        Select page_size row(s) coming after the keys values in after (in 
+        keys order) from the database table of cls. If after is None, the 
+        first page_size row(s) are selected.
 
-        event.wait()
+        Unlike select_page, the rows before the page are not scanned and 
+        skipped (as with offset), so the cost of a page does not grow with 
+        its number. keys should therefore be indexed, and unique as a whole.
 
-        global _rows
-        if as_obj:
-            return _convert(_rows[event], cls)
-        return _rows[event]
+        Filters can be applied through args and kwargs. Example:
 
-    except Exception as e:
-        console.error('%s %s', e.__class__.__name__, str(e))
-        file.exception(e.__class__.__name__)
+            >>> select_after(Request, (1700000000.0, 'abc'), 15, keys=('hreq_at', 'id'), as_obj=False)
+
+        as_obj should only be set to True if fields is (*).
+
+        Returns list of rows if selected, None if not.
+    '''
+
+    where, vals = _get_where_str(**kwargs)
+    if after != None:
+        where = ((where + ' and ' if where else ' where ')
+                 + '(' + ','.join(keys) + ') > ('
+                 + ','.join('?' * len(keys)) + ')')
+        vals += tuple(after)
+    return _select_range(cls, fields, where, vals, keys, page_size, 0,
+                         as_obj)
+
+
+def count(cls, max_age: float = COUNT_MAX_AGE, **kwargs):
+    '''
+        Count rows in the database table of cls.
+
+        Filters can be applied through args and kwargs. Example:
+
+            >>> count(Request, host=('=', '10.0.0.2'))
+
+        Counting scans all matching rows, so counts are cached and reused 
+        for max_age seconds (0 to always count).
+
+        Returns number of rows if counted, None if not.
+    '''
+
+    where, vals = _get_where_str(**kwargs)
+    key = (_tables[cls.__name__], where, vals)
+    now = monotonic()
+    cached = _counts.get(key)
+    if cached != None and now - cached[1] < max_age:
+        return cached[0]
+    rows = select(cls, ('count(*)',), as_obj=False, **kwargs)
+    if rows == None:
         return None
+    _counts[key] = (rows[0][0], now)
+    return rows[0][0]
 
 
 def as_csv(cls, abs_path: str = '', fields: tuple = ('*',),
@@ -273,6 +354,13 @@ class Connection:
     def __new__(self):
         if not hasattr(self, '_connection'):
             self._connection = connect(DB_PATH)
+            # all queries go through this connection (on the _execute
+            # thread), so this is for writes: commits append to the log
+            # and are not synced to disk (only checkpoints are), and other
+            # processes reading the file (e.g. the sqlite3 shell) do not
+            # hold them up
+            self._connection.execute('pragma journal_mode=wal')
+            self._connection.execute('pragma synchronous=normal')
             self._connection.executescript(DEFINITIONS).connection.commit()
             self._connection.row_factory = lambda _, row: list(row)
             try:
@@ -306,7 +394,10 @@ def _execute():
     while True:
         try:
             sql, params, event = _queue.get()
-            cursor = Connection().execute(sql, params)
+            if params.__class__ is list:
+                cursor = Connection().executemany(sql, params)
+            else:
+                cursor = Connection().execute(sql, params)
             if sql[0:6] == 'select':
                 _rows[event] = cursor.fetchall()
             event.set()
@@ -374,10 +465,9 @@ def _convert(itr: list, cls):
         if cls.__name__ is Request.__name__:
             obj = Request(
                 item[0], select(CoS, id=('=', item[1]))[0], item[2], item[3],
-                item[4], item[5], item[6], item[7], {
-                    att.attempt_no: att
-                    for att in select(Attempt, req_id=('=', item[0]))
-                })
+                item[4], item[5], item[6], item[7],
+                select(Attempt, orders=('attempt_no',),
+                       req_id=('=', item[0])))
 
         if cls.__name__ is Attempt.__name__:
             obj = Attempt(
@@ -396,7 +486,8 @@ def _convert(itr: list, cls):
     return ret
 
 
-# get table columns as tuple
+# get table columns as tuple (memoized, since they do not change at runtime)
+@lru_cache(maxsize=None)
 def _get_columns(cls):
     if cls.__name__ is CoS.__name__:
         return ('id', 'name', 'max_response_time', 'min_concurrent_users',
@@ -419,6 +510,36 @@ def _get_columns(cls):
     return ()
 
 
+# select at most limit rows after offset
+def _select_range(cls, fields: tuple, where: str, vals: tuple, orders: tuple,
+                  limit: int, offset: int, as_obj: bool):
+    try:
+        order_by = _get_orders_str(orders)
+
+        event = Event()
+
+        global _queue
+        _queue.put((
+            'select {} from {} {} limit ? offset ?'.format(
+                _get_fields_str(fields), _tables[cls.__name__],
+                where + order_by),
+            vals + (limit, offset),
+            event
+        ))
+
+        event.wait()
+
+        global _rows
+        if as_obj:
+            return _convert(_rows[event], cls)
+        return _rows[event]
+
+    except Exception as e:
+        console.error('%s %s', e.__class__.__name__, str(e))
+        file.exception(e.__class__.__name__)
+        return None
+
+
 def _get_fields_str(fields: tuple):
     fields_str = '*'
     for field in fields:
@@ -433,6 +554,12 @@ def _get_where_str(**kwargs):
     vals = ()
     for key in kwargs:
         cond, val = kwargs[key]
+        if cond == 'in':
+            # val is an iterable of values
+            val = tuple(str(v) for v in val)
+            where += key + ' in (' + ','.join('?' * len(val)) + ') and '
+            vals += val
+            continue
         where += key + cond + '? and '
         vals += (str(val),)
     if where:
@@ -1,13 +1,14 @@
 from datetime import datetime
 from math import floor
 
-from dash import register_page, Input, Output, callback
+from dash import register_page, Input, Output, callback, ctx
 from dash.html import Div, Button
 from dash.dash_table import DataTable
 
-from pandas import DataFrame
+from pandas import DataFrame, notna
 
-from model import Request, Attempt, CoS
+from model import Request, CoS
+from dblib import COUNT_MAX_AGE
 
 
 register_page(__name__, path='/', redirect_from=['/requests'],
@@ -16,54 +17,65 @@ register_page(__name__, path='/', redirect_from=['/requests'],
 cos_names = {cos[0]: cos[1] 
              for cos in CoS.select(fields=('id', 'name'), as_obj=False)}
 
-cols = list(Request.columns())
-for i, col in enumerate(cols):
-    if col == 'id':
-        cols[i] = 'ID'
-    elif col == 'cos_id':
-        cols[i] = 'CoS'
-    elif col == 'hreq_at':
-        cols[i] = 'Start'
-    elif col == 'dres_at':
-        cols[i] = 'Finish'
-    else:
-        cols[i] = col.capitalize()
-cols.extend(['Time (ms)', 'Attempts'])
+RAW_COLS = tuple(Request.columns())
+RENAME = {'id': 'ID', 'cos_id': 'CoS', 'hreq_at': 'Start', 'dres_at': 'Finish'}
+DISPLAY_COLS = ([RENAME.get(col, col.capitalize()) for col in RAW_COLS]
+                + ['Time (ms)', 'Attempts'])
+IDX = {col: i for i, col in enumerate(DISPLAY_COLS)}
 
 PAGE_SIZE = 15
-
-
-def get_data(page):
-    requests = Request.select_page(page, PAGE_SIZE, orders=('hreq_at',),
-                                   as_obj=False)
-    for row in requests:
-        start = finish = attempts = 0
-        for i, col in enumerate(cols):
-            if col == 'ID':
-                attempts = Attempt.select(fields=('count(*)',), as_obj=False,
-                                          req_id=('=', row[i]))[0][0]
-            elif col == 'CoS':
-                row[i] = cos_names[row[i]]
-            elif col == 'Data' or col == 'Result':
-                row[i] = row[i].decode() if row[i] else None
-            elif col == 'State':
-                row[i] = Request._states[row[i]]
-            elif col == 'Start':
-                start = row[i]
-                row[i] = datetime.fromtimestamp(row[i]) if row[i] else None
-            elif col == 'Finish':
-                finish = row[i]
-                row[i] = datetime.fromtimestamp(row[i]) if row[i] else None
-        row.extend([
-            round((finish - start) * 1000, 2) if finish else None,
-            attempts
-        ])
-
-    _count = Request.select(fields=('count(*)',),
-                            as_obj=False)[0][0] / PAGE_SIZE
+# page rows come with their number of attempts
+PAGE_FIELDS = ('*', '(select count(*) from attempts '
+               'where attempts.req_id = requests.id)')
+# page order, also used as cursor to select the next page
+PAGE_KEYS = ('hreq_at', 'id')
+_KEYS_IDX = tuple(RAW_COLS.index(key) for key in PAGE_KEYS)
+
+# keys of the last row of each page served (the next page is selected after
+# them instead of skipping all previous rows)
+_cursors = {}
+
+
+def get_data(page, refresh=False):
+    after = _cursors.get(page - 1)
+    if page == 1 or after != None:
+        requests = Request.select_after(
+            after, PAGE_SIZE, fields=PAGE_FIELDS, keys=PAGE_KEYS,
+            as_obj=False)
+    else:
+        requests = Request.select_page(
+            page, PAGE_SIZE, fields=PAGE_FIELDS, orders=PAGE_KEYS,
+            as_obj=False)
+    # the count (a full scan) is only redone on refresh or once outdated
+    total = Request.count(max_age=0 if refresh else COUNT_MAX_AGE)
+    if requests:
+        cursor = tuple(requests[-1][i] for i in _KEYS_IDX)
+        # null keys cannot be compared with
+        if None not in cursor:
+            _cursors[page] = cursor
+    # columns are converted as a whole
+    df = DataFrame(requests, columns=DISPLAY_COLS[:len(RAW_COLS)]
+                   + ['Attempts'])
+    start = df['Start'].astype(float)
+    finish = df['Finish'].astype(float)
+    df['Time (ms)'] = ((finish - start) * 1000).round(2)
+    df['CoS'] = df['CoS'].map(cos_names)
+    df['State'] = df['State'].map(Request._states)
+    for col in ('Data', 'Result'):
+        df[col] = df[col].map(lambda x: x.decode() if x else None)
+    for col in ('Start', 'Finish'):
+        # local time (like datetime.fromtimestamp); null timestamps are NaN
+        # in columns that also hold numbers
+        df[col] = df[col].map(
+            lambda x: datetime.fromtimestamp(x) if notna(x) else None)
+    df = df[DISPLAY_COLS]
+    # missing values are shown as empty cells
+    df = df.astype(object).where(df.notna(), None)
+
+    _count = total / PAGE_SIZE
     count = floor(_count)
 
-    return (DataFrame(requests, columns=cols).to_dict('records'),
+    return (df.to_dict('records'),
             count + 1 if count < _count else count)
 
 
@@ -83,4 +95,8 @@ layout = Div(className='page reduced-left', children=[
     Input('requests-tbl', 'page_current'),
     Input('refresh-btn', 'n_clicks'))
 def _update_table(page_current, _):
-    return get_data(page_current + 1)
+    refresh = ctx.triggered_id == 'refresh-btn'
+    if refresh:
+        # rows may have been added before the known cursors
+        _cursors.clear()
+    return get_data(page_current + 1, refresh)
@@ -1,22 +1,58 @@
-from logging import getLogger, StreamHandler, FileHandler, Formatter, DEBUG
+from logging import (getLogger, StreamHandler, FileHandler, Formatter, DEBUG,
+                     WARNING)
 from os import makedirs
+from os.path import dirname
 
 from consts import ROOT_PATH
 
 
-makedirs(ROOT_PATH + '/data', mode=0o777, exist_ok=True)
-
 LOG_FILE = ROOT_PATH + '/data/app.log'
 FILE_LEVEL = DEBUG
+CONSOLE_LEVEL = WARNING
+CONSOLE_FORMAT = ' *** %(levelname)s in %(module)s - %(message)s'
+# without msecs, asctime needs no extra formatting
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+# writes the console format directly (the formatter is only used for
+# records with exception info)
+class _ConsoleHandler(StreamHandler):
+    def emit(self, record):
+        if record.exc_info or record.stack_info:
+            return super().emit(record)
+        try:
+            self.stream.write(CONSOLE_FORMAT % {
+                'levelname': record.levelname,
+                'module': record.module,
+                'message': record.getMessage()
+            } + self.terminator)
+            self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+# only creates the log file (and its directory) when the first record is
+# written, so importing this module touches no files
+class _FileHandler(FileHandler):
+    def __init__(self, filename):
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        makedirs(dirname(self.baseFilename), mode=0o777, exist_ok=True)
+        return super()._open()
 
 
 # console logger (root)
 console = getLogger('fog_client_console')
 
 # config console logger
-_stream_handler = StreamHandler()
-_stream_handler.setFormatter(
-    Formatter(' *** %(levelname)s in %(module)s - %(message)s'))
+_stream_handler = _ConsoleHandler()
+_stream_handler.setLevel(CONSOLE_LEVEL)
+_stream_handler.setFormatter(Formatter(CONSOLE_FORMAT))
+# filtered records are dropped by isEnabledFor before being created
+console.setLevel(CONSOLE_LEVEL)
 console.addHandler(_stream_handler)
 console.propagate = False
 
@@ -25,10 +61,30 @@ console.propagate = False
 file = getLogger('fog_client_file')
 
 # config file logger
-_file_handler = FileHandler(LOG_FILE)
+_file_handler = _FileHandler(LOG_FILE)
 _file_handler.setLevel(FILE_LEVEL)
 _file_handler.setFormatter(
-    Formatter('%(asctime)s - %(levelname)s in %(module)s - %(message)s'))
+    Formatter('%(asctime)s - %(levelname)s in %(module)s - %(message)s',
+              DATE_FORMAT))
 file.setLevel(FILE_LEVEL)
 file.addHandler(_file_handler)
 file.propagate = False
+
+
+# console and file logger (for messages that are the same on both, so they
+# are only logged once)
+log = getLogger('fog_client')
+log.setLevel(FILE_LEVEL)
+log.addHandler(_stream_handler)
+log.addHandler(_file_handler)
+log.propagate = False
+
+
+def set_console_level(level: int):
+    '''
+        Set the level of messages shown on the console (by both console and 
+        log loggers).
+    '''
+
+    console.setLevel(level)
+    _stream_handler.setLevel(level)
@@ -1,17 +1,58 @@
-from os import environ, getenv
-from threading import Thread
-from time import sleep
-from psutil import net_if_addrs
-from socket import socket, AF_INET, AF_PACKET, SOCK_DGRAM, gethostname
-from re import findall
+from os import environ
+from threading import Thread, Event, current_thread
+from time import monotonic
+from random import uniform
+from queue import Queue, Empty
+from heapq import heappush, heappop
+from socket import (socket, AF_INET, AF_PACKET, SOCK_DGRAM, IPPROTO_IP,
+                    IP_TOS, gethostname)
 from uuid import getnode
+from re import compile
 
 from python_ovs_vsctl import (VSCtl, list_cmd_parser, VSCtlCmdExecError,
                               VSCtlCmdParseError)
 from model import Node, NodeType, Interface
 from consts import MODE_CLIENT, MODE_RESOURCE, MODE_SWITCH, HTTP_EXISTS
-from logger import console, file
-from utils import SingletonMeta, get_default_ip, all_exit
+from logger import console, file, log
+from utils import (SingletonMeta, get_default_ip, all_exit, getenv_int,
+                   getenv_float, getenv_bool, cached_net_if_addrs)
+
+
+# specs differences below which specs are considered unchanged (so they are
+# not sent again before the max update interval)
+SPECS_DELTAS = {
+    'cpu_free': 0.01,  # 1% of a CPU
+    'memory_free': 1,  # in MB
+    'disk_free': 0.01,  # in GB
+    'capacity': 0,  # in Mbit/s
+    'bandwidth_up': 0.1,  # in Mbit/s
+    'bandwidth_down': 0.1,  # in Mbit/s
+}
+
+# interface attributes set from the addresses of each family
+FAMILY_ATTRS = {AF_INET: 'ipv4', AF_PACKET: 'mac'}
+
+HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+
+# node IDs built from the MAC (see _get_id)
+MAC_RE = compile('([0-9a-f]{2}:){5}[0-9a-f]{2}')
+
+# measures of interfaces the monitor has none for (shared, never modified)
+NO_MEASURES = {}
+
+# with partial specs updates, all specs are still sent every so many updates
+FULL_SPECS_EVERY = 10
+
+# IPTOS_LOWDELAY
+HEARTBEAT_TOS = 0x10
+
+# wait between failed attempts to reach the orchestrator (while connecting,
+# or re-adding the node while specs are not being sent): min for the first
+# few (fast) attempts, then doubles on each failure up to max, with jitter
+# so many nodes started together do not retry in lockstep
+RETRY_MIN_WAIT = 0.5
+RETRY_FAST_ATTEMPTS = 3
+RETRY_MAX_WAIT = 30
 
 
 class Manager(metaclass=SingletonMeta):
@@ -39,12 +80,21 @@ class Manager(metaclass=SingletonMeta):
         topology.
     '''
 
+    __slots__ = ('node', 'verbose', '_mode', '_connected', '_iperf3_listeners',
+                 '_stop', '_tasks', '_scheduler')
+
     def __init__(self, node: Node = None, verbose: bool = False):
         self.node = node
         self.verbose = verbose
 
         self._connected = False
         self._iperf3_listeners = []
+        # set by disconnect() to stop connection attempts right away
+        self._stop = Event()
+        # periodic tasks (heartbeats and specs updates) all run in a single
+        # thread (see _schedule)
+        self._tasks = Queue()
+        self._scheduler = None
 
     def connect(self, mode: str, **kwargs):
         '''
@@ -68,14 +118,17 @@ class Manager(metaclass=SingletonMeta):
 
             If the mode is 'switch', 'dpid' kwarg must be specified.
 
-            Returns True if joined, loops if not.
+            Returns True if joined, loops if not (until disconnect() is 
+            called, in which case returns False).
         '''
 
         self._mode = mode
+        self._stop.clear()
 
         from api import get_config, add_node, add_iperf3_listeners
         conf = None
         _code = [0, 0]
+        retries = 0
         console.info('Getting configuration')
         while conf == None:
             conf, *code = get_config()
@@ -88,7 +141,9 @@ class Manager(metaclass=SingletonMeta):
                 if _code[0] != code[0] or _code[1] != code[1]:
                     console.error(code)
                     _code = code
-                sleep(1)
+                if not self._retry_wait(retries):
+                    return False
+                retries += 1
         console.info('Done')
 
         if not self.node:
@@ -100,6 +155,7 @@ class Manager(metaclass=SingletonMeta):
             self.node.main_interface = MY_IFACE
             self.node.threshold = THRESHOLD
             _code = [0, 0]
+            retries = 0
             console.info('Connecting')
             while not self._connected:
                 added, *code = add_node(self.node)
@@ -112,13 +168,15 @@ class Manager(metaclass=SingletonMeta):
                         self._connected = True
                         console.info('Done')
                         console.info('Node added successfully')
-                        Thread(target=self._udp_connect, daemon=True).start()
+                        self._schedule(self._udp_connect())
                     else:
                         file.error(code)
                         if _code[0] != code[0] or _code[1] != code[1]:
                             console.error(code)
                             _code = code
-                        sleep(1)
+                        if not self._retry_wait(retries):
+                            return False
+                        retries += 1
 
         self._connected = True
 
@@ -126,10 +184,7 @@ class Manager(metaclass=SingletonMeta):
         from my_iperf3 import launch_iperf3
         launch_iperf3(self.node, self._iperf3_listeners)
 
-        daemon = True
-        if MODE_SWITCH:
-            daemon = False
-        Thread(target=self._update_specs, daemon=daemon).start()
+        self._schedule(self._update_specs())
 
         return True
 
@@ -140,24 +195,104 @@ class Manager(metaclass=SingletonMeta):
             Returns True if withdrawn properly, False if not.
         '''
 
-        from api import delete_node, delete_iperf3_listeners
+        from api import delete_node, delete_iperf3_listeners, close
         console.info('Disconnecting')
         self._connected = False
-        delete_iperf3_listeners(self.node)
-        if self._mode != MODE_SWITCH:
-            if self.node:
-                deleted, *code = delete_node(self.node)
-                if deleted:
-                    console.info('Done')
-                    console.info('Node deleted successfully')
-                else:
-                    console.error('Node not deleted %s', str(code))
-                    file.error('Node not deleted %s', str(code))
-                    return False
-            return True
+        self._stop.set()
+        if self._scheduler:
+            # the old scheduler drains its own queue up to the sentinel, so
+            # a later connect() starts a new one with a fresh queue
+            self._tasks.put(None)
+            if self._scheduler != current_thread():
+                self._scheduler.join(timeout=1)
+            self._tasks = Queue()
+            self._scheduler = None
+        try:
+            delete_iperf3_listeners(self.node)
+            if self._mode != MODE_SWITCH:
+                if self.node:
+                    deleted, *code = delete_node(self.node)
+                    if deleted:
+                        console.info('Done')
+                        console.info('Node deleted successfully')
+                    else:
+                        console.error('Node not deleted %s', str(code))
+                        file.error('Node not deleted %s', str(code))
+                        return False
+                return True
+        finally:
+            close()
+
+    def _schedule(self, task):
+        # task is a generator that yields the time (in seconds) to wait
+        # before it is resumed
+        if not self._scheduler:
+            # not a daemon, so the node keeps running once the main thread
+            # is done, whatever the mode
+            self._scheduler = Thread(target=self._run_tasks,
+                                     args=(self._tasks,), daemon=False)
+            self._scheduler.start()
+        self._tasks.put(task)
+
+    def _run_tasks(self, tasks: Queue):
+        # (deadline, order, task) heap, so the earliest task is resumed first
+        heap = []
+        order = 0
+        # tasks already reported running late (reported only once)
+        late = set()
+        while True:
+            timeout = None
+            if heap:
+                timeout = max(0, heap[0][0] - monotonic())
+            try:
+                task = tasks.get(timeout=timeout)
+            except Empty:
+                at, _, task = heappop(heap)
+                try:
+                    wait = next(task)
+                except StopIteration:
+                    continue
+                except Exception as e:
+                    console.error('Periodic task stopped due to %s',
+                                  e.__class__.__name__)
+                    file.exception('Periodic task stopped due to %s',
+                                   e.__class__.__name__)
+                    continue
+            else:
+                # None is queued by disconnect() to stop all tasks
+                if task == None:
+                    break
+                at = monotonic()
+                wait = 0
+            # deadlines follow on from the previous one (not from when the
+            # task was done), so periods do not drift by the task's run time;
+            # if more than a period behind, missed runs are skipped
+            now = monotonic()
+            at += wait
+            if at < now - wait:
+                if task not in late:
+                    late.add(task)
+                    file.warning('Periodic task %s running late',
+                                 task.__name__)
+                at = now + wait
+            order += 1
+            heappush(heap, (max(at, now), order, task))
+        for _, _, task in heap:
+            task.close()
+
+    def _retry_delay(self, retries: int):
+        # fast, then exponential (up to RETRY_MAX_WAIT), with jitter
+        retries = min(max(retries - RETRY_FAST_ATTEMPTS + 1, 0), 16)
+        wait = min(RETRY_MIN_WAIT * 2 ** retries, RETRY_MAX_WAIT)
+        return wait * uniform(0.8, 1.2)
+
+    def _retry_wait(self, retries: int):
+        # returns False if disconnect() was called while waiting
+        return not self._stop.wait(self._retry_delay(retries))
 
     def _get_id(self):
-        return ':'.join(findall('..', '%012x' % getnode()))  # MAC
+        # MAC (getnode caches it after the first call)
+        return getnode().to_bytes(6, 'big').hex(':')
 
     def _get_label(self):
         return gethostname()
@@ -165,18 +300,14 @@ class Manager(metaclass=SingletonMeta):
     def _build(self, **kwargs):
         console.info('Building node and interfaces')
         if self._mode == MODE_SWITCH:
-            try:
-                id = kwargs['dpid']
-                int(id, 16)
-            except KeyError:
-                console.error('DPID argument missing')
-                file.exception('DPID argument missing')
+            id = kwargs.get('dpid', None)
+            if id == None:
+                log.error('DPID argument missing')
                 all_exit()
-            except ValueError:
-                console.error('DPID argument invalid (must be hexadecimal)')
-                file.exception('DPID argument invalid (must be hexadecimal)')
+            if not id or not HEX_DIGITS.issuperset(id):
+                log.error('DPID argument invalid (must be hexadecimal)')
                 all_exit()
-            type = NodeType(NodeType.SWITCH)
+            type = NodeType.SWITCH
             label = ''
         else:
             id = kwargs.get('id', None)
@@ -185,21 +316,25 @@ class Manager(metaclass=SingletonMeta):
             label = kwargs.get('label', None)
             if not label:
                 label = self._get_label()
-            type = NodeType(NodeType.SERVER)
+            type = NodeType.SERVER
         self.node = Node(id, True, type, label)
         self.node._default_iperf3_ip = get_default_ip()
 
-        for name, snics in net_if_addrs().items():
+        # bound once for the loop below (hosts can have many interfaces,
+        # e.g. veth pairs of containers)
+        interfaces = self.node.interfaces
+        default_iperf3_ip = self.node._default_iperf3_ip
+        get_attr = FAMILY_ATTRS.get
+        for name, snics in cached_net_if_addrs().items():
             if name != 'lo':
                 interface = Interface(name)
-                for snic in snics:
-                    if snic.family == AF_INET:
-                        interface.ipv4 = snic.address
-                        interface._iperf3_ip = (
-                            snic.address or self.node._default_iperf3_ip)
-                    if snic.family == AF_PACKET:
-                        interface.mac = snic.address
-                self.node.interfaces[name] = interface
+                for family, address, *_ in snics:
+                    attr = get_attr(family, None)
+                    if attr:
+                        setattr(interface, attr, address)
+                if interface.ipv4 != None:
+                    interface._iperf3_ip = interface.ipv4 or default_iperf3_ip
+                interfaces[name] = interface
         if self._mode == MODE_SWITCH:
             try:
                 # get ports from OVS
@@ -231,35 +366,49 @@ class Manager(metaclass=SingletonMeta):
 
     def _udp_connect(self):
         from common import SERVER_IP
-        try:
-            UDP_PORT = int(getenv('ORCHESTRATOR_UDP_PORT', None))
-        except:
-            console.warning('ORCHESTRATOR:UDP_PORT parameter invalid or '
-                            'missing from received configuration. '
-                            'Defaulting to 7070')
-            file.warning('ORCHESTRATOR:UDP_PORT parameter invalid or missing '
-                         'from received configuration', exc_info=True)
+        UDP_PORT = getenv_int('ORCHESTRATOR_UDP_PORT')
+        if UDP_PORT == None:
+            log.warning('ORCHESTRATOR:UDP_PORT parameter invalid or missing '
+                        'from received configuration. Defaulting to 7070')
             UDP_PORT = 7070
-        try:
-            UDP_TIMEOUT = float(getenv('ORCHESTRATOR_UDP_TIMEOUT', None))
-        except:
-            console.warning('ORCHESTRATOR:UDP_TIMEOUT parameter invalid or '
-                            'missing from received configuration. '
-                            'Defaulting to 1s')
-            file.warning('ORCHESTRATOR:UDP_TIMEOUT parameter invalid or '
-                         'missing from received configuration', exc_info=True)
+        UDP_TIMEOUT = getenv_float('ORCHESTRATOR_UDP_TIMEOUT')
+        if UDP_TIMEOUT == None:
+            log.warning('ORCHESTRATOR:UDP_TIMEOUT parameter invalid or '
+                        'missing from received configuration. '
+                        'Defaulting to 1s')
             UDP_TIMEOUT = 1
         period = UDP_TIMEOUT / 2
+        # the payload is encoded and the destination fixed once, so each
+        # heartbeat is a plain send
+        payload = str(self.node.id).encode()
+        # if the orchestrator accepts it, a MAC ID is sent as its 6 raw bytes
+        # instead of 17 characters
+        if getenv_bool('ORCHESTRATOR_UDP_BINARY') and MAC_RE.fullmatch(
+                str(self.node.id)):
+            payload = bytes.fromhex(str(self.node.id).replace(':', ''))
         udp_client = socket(family=AF_INET, type=SOCK_DGRAM)
-        while self._connected:
-            udp_client.sendto(str(self.node.id).encode(),
-                              (SERVER_IP, UDP_PORT))
-            sleep(period)
-        udp_client.close()
+        # heartbeats are marked low-delay so they are not queued behind bulk
+        # traffic (e.g. iPerf3) on the way to the orchestrator
+        try:
+            udp_client.setsockopt(IPPROTO_IP, IP_TOS, HEARTBEAT_TOS)
+        except OSError:
+            file.warning('Heartbeat TOS not set', exc_info=True)
+        udp_client.connect((SERVER_IP, UDP_PORT))
+        try:
+            while self._connected:
+                try:
+                    udp_client.send(payload)
+                except OSError:
+                    # e.g. ICMP port unreachable reported on connected socket
+                    pass
+                yield period
+        finally:
+            udp_client.close()
 
     def _update_specs(self):
         from resources import MEASURES, MONITOR_PERIOD, get_resources
-        from api import add_node, update_node_specs, add_iperf3_listeners
+        from api import (add_node_async, update_node_specs_async,
+                         add_iperf3_listeners_async)
         from my_iperf3 import iperf3_measures
 
         # constant measures
@@ -268,52 +417,143 @@ class Manager(metaclass=SingletonMeta):
         self.node.set_memory_total(RAM)
         self.node.set_disk_total(DISK)
 
+        # the update interval doubles (up to max) while specs are unchanged,
+        # and is reset to min as soon as they change
+        MIN_INTERVAL = getenv_float('PROTOCOL_UPDATE_MIN_INTERVAL')
+        if MIN_INTERVAL == None:
+            MIN_INTERVAL = MONITOR_PERIOD
+        MAX_INTERVAL = getenv_float('PROTOCOL_UPDATE_MAX_INTERVAL')
+        if MAX_INTERVAL == None:
+            MAX_INTERVAL = 5
+        MAX_INTERVAL = max(MIN_INTERVAL, MAX_INTERVAL)
+        # if the orchestrator accepts it, only changed specs are sent, except
+        # for every FULL_SPECS_EVERY updates and after errors
+        PARTIAL = getenv_bool('SERVER_API_PARTIAL_SPECS') == True
+
+        # bound once for the loop below (interfaces are all known once the
+        # node is built, so they are not copied again on every update)
+        node = self.node
+        get_measures = MEASURES.get
+        ifaces = tuple(node.interfaces.items())
+
         err = False
         _code = [0, 0]
+        pending = None
+        interval = MIN_INTERVAL
+        last_specs = None
+        last_sent_at = 0
+        readd_retries = 0
+        readd_at = 0
+        pushes = 0
         while self._connected:
             if not err:
-                sleep(MONITOR_PERIOD)
+                yield interval
             else:
-                sleep(1)
+                yield 1
+
+            # specs are pushed in the background, so the acknowledgement of
+            # the previous push is checked here (its round trip overlaps with
+            # the wait instead of adding to the period, and a push still in
+            # flight does not hold up the other tasks)
+            if pending and pending.done():
+                try:
+                    updated, *code = pending.result()
+                except Exception as e:
+                    updated, code = False, [None, e.__class__.__name__]
+                pending = None
+                if updated:
+                    if err:
+                        # in the background, like re-adding the node
+                        add_iperf3_listeners_async(node)
+                    err = False
+                    readd_retries = 0
+                    readd_at = 0
+                    if _code[0] != code[0] or _code[1] != code[1]:
+                        if self._mode == MODE_RESOURCE:
+                            console.info('Node specs are being sent')
+                        else:
+                            console.info('Network specs are being sent')
+                        _code = code
+
+                else:
+                    err = True
+                    file.error('Specs are not being sent %s', str(code))
+                    if _code[0] != code[0] or _code[1] != code[1]:
+                        console.error('Specs are not being sent %s',
+                                      str(code))
+                        _code = code
+
+                    # if connection to controller was lost but is back
+                    # re-add node in case it was deleted (in the background,
+                    # so heartbeats are not held up); attempts are spaced
+                    # out like connection attempts, so many nodes do not all
+                    # re-add at once when the controller comes back
+                    if (self._mode != MODE_SWITCH
+                            and monotonic() >= readd_at):
+                        add_node_async(node)
+                        readd_at = monotonic() + self._retry_delay(
+                            readd_retries)
+                        readd_retries += 1
+
             # current resources are gotten from simulator
             cpu, ram, disk = get_resources(quiet=True)
-            self.node.set_cpu_free(cpu)
-            self.node.set_memory_free(ram)
-            self.node.set_disk_free(disk)
+            node.set_cpu_free(cpu)
+            node.set_memory_free(ram)
+            node.set_disk_free(disk)
             # other stats are gotten from monitor
-            for name, iface in list(self.node.interfaces.items()):
-                IM = MEASURES.get(name, {})
-                iface.set_capacity(IM.get('capacity', None))
-                iface.set_bandwidth_up(IM.get('bandwidth_up', None))
-                iface.set_bandwidth_down(IM.get('bandwidth_down', None))
-                iface.set_tx_packets(IM.get('tx_packets', None))
-                iface.set_rx_packets(IM.get('rx_packets', None))
-                iface.set_tx_bytes(IM.get('tx_bytes', None))
-                iface.set_rx_bytes(IM.get('rx_bytes', None))
+            for name, iface in ifaces:
+                iface.set_measures(get_measures(name, NO_MEASURES))
                 if name in iperf3_measures:
                     iface._recv_bps = iperf3_measures[name].get(
                         'received_bps', None)
 
-            updated, *code = update_node_specs(self.node)
-            if updated:
-                if err:
-                    add_iperf3_listeners(self.node)
-                err = False
-                if _code[0] != code[0] or _code[1] != code[1]:
-                    if self._mode == MODE_RESOURCE:
-                        console.info('Node specs are being sent')
-                    else:
-                        console.info('Network specs are being sent')
-                    _code = code
-
+            specs = self._get_specs(ifaces)
+            # identical specs (the usual case on an idle node) are compared
+            # in one go before looking at per-field deltas
+            changed = (specs != last_specs
+                       and self._specs_changed(last_specs, specs))
+            # after an error, updates also start again from min, so the
+            # orchestrator gets fresh specs soon after it is back
+            if changed or err:
+                interval = MIN_INTERVAL
             else:
-                err = True
-                file.error('Specs are not being sent %s', str(code))
-                if _code[0] != code[0] or _code[1] != code[1]:
-                    console.error('Specs are not being sent %s', str(code))
-                    _code = code
-
-                # if connection to controller was lost but is back
-                # re-add node in case it was deleted
-                if self._mode != MODE_SWITCH:
-                    add_node(self.node)
+                interval = min(interval * 2, MAX_INTERVAL)
+            if pending == None and (
+                    err or changed
+                    or monotonic() - last_sent_at >= MAX_INTERVAL):
+                pending = update_node_specs_async(
+                    node, partial=(PARTIAL and not err
+                                   and pushes % FULL_SPECS_EVERY != 0))
+                pushes += 1
+                last_specs = specs
+                last_sent_at = monotonic()
+
+    def _get_specs(self, ifaces: tuple):
+        # variable specs compared between updates (ifaces is the snapshot of
+        # (name, interface) pairs taken by _update_specs)
+        specs = {
+            'cpu_free': self.node.get_cpu_free(),
+            'memory_free': self.node.get_memory_free(),
+            'disk_free': self.node.get_disk_free(),
+        }
+        for name, iface in ifaces:
+            specs[name] = {
+                'capacity': iface.get_capacity(),
+                'bandwidth_up': iface.get_bandwidth_up(),
+                'bandwidth_down': iface.get_bandwidth_down(),
+            }
+        return specs
+
+    def _specs_changed(self, old: dict, new: dict):
+        if old == None or old.keys() != new.keys():
+            return True
+        for key, val in new.items():
+            if isinstance(val, dict):
+                if self._specs_changed(old[key], val):
+                    return True
+            elif val == None or old[key] == None:
+                if val != old[key]:
+                    return True
+            elif abs(val - old[key]) > SPECS_DELTAS[key]:
+                return True
+        return False
@@ -31,12 +31,28 @@
 
 from copy import copy
 from time import time
-from enum import Enum
 from datetime import datetime
 
 from consts import HREQ, RREQ, DREQ, DRES, FAIL
 
 
+# types whose values are returned as-is in dictionaries (copying them would
+# be a no-op anyway)
+_IMMUTABLE = frozenset({int, float, str, bytes, bool, type(None), tuple})
+
+# dblib module, bound on first database operation (it cannot be imported at
+# load time since it imports this module)
+_dblib = None
+
+
+def _db():
+    global _dblib
+    if _dblib == None:
+        import dblib
+        _dblib = dblib
+    return _dblib
+
+
 class Model:
     '''
         Base class for all model classes.
@@ -49,13 +65,24 @@ class Model:
 
         insert(): Insert as a row in the corresponding database table. 
 
+        insert_many(objs): Insert objs as rows in the corresponding database 
+        table.
+
         update(): Update corresponding database table row.
 
         select(cls, fields, groups, orders, as_obj, **kwargs): Select row(s) 
         from the corresponding database table.
 
-        select_page(page, page_size, fields, orders, as_obj, **kwargs): Select 
-        page_size row(s) of page from the corresponding database table.
+        select_page(page, page_size, fields, orders, as_obj, **kwargs): 
+        Select page_size row(s) of page from the corresponding database 
+        table.
+
+        select_after(after, page_size, fields, keys, as_obj, **kwargs): 
+        Select page_size row(s) coming after the keys values in after from 
+        the corresponding database table.
+
+        count(max_age, **kwargs): Count rows in the corresponding database 
+        table (cached for max_age seconds).
 
         as_csv(cls, abs_path, fields, orders, _suffix, **kwargs): Convert the 
         corresponding database table to a CSV file.
@@ -64,6 +91,10 @@ class Model:
         table.
     '''
 
+    # subclasses can declare __slots__ (for those created in large numbers
+    # and updated often, like interfaces and their specs)
+    __slots__ = ()
+
     def as_dict(self, flat: bool = False, _prefix: str = ''):
         '''
             Converts object to a dictionary and returns it. If flat is False, 
@@ -75,10 +106,27 @@ class Model:
             (example: cos.id will become cos_id).
         '''
 
-        if flat and _prefix:
-            _prefix += '_'
-        return {_prefix + str(key): copy(val)
-                for key, val in self.__dict__.items()}
+        if flat:
+            if _prefix:
+                _prefix += '_'
+            # built in one pass (nested objects add their own prefixed items)
+            return dict(self._iter_flat(_prefix))
+        return {key: val if val.__class__ in _IMMUTABLE else copy(val)
+                for key, val in self._items()}
+
+    # attributes, whether stored in __dict__ or in __slots__
+    def _items(self):
+        if hasattr(self, '__dict__'):
+            return self.__dict__.items()
+        return ((key, getattr(self, key)) for key in self.__slots__)
+
+    # (prefixed name, value) pairs of flat dictionary, except for attributes
+    # in _skip (to be redefined by classes with nested objects)
+    def _iter_flat(self, prefix: str, _skip: tuple = ()):
+        for key, val in self._items():
+            if key not in _skip:
+                yield prefix + key, (val if val.__class__ in _IMMUTABLE
+                                     else copy(val))
 
     # the following methods are for database operations
 
@@ -89,8 +137,19 @@ class Model:
             Returns True if inserted, False if not.
         '''
 
-        from dblib import insert
-        return insert(self)
+        return _db().insert(self)
+
+    @classmethod
+    def insert_many(cls, objs):
+        '''
+            Insert objs (of this class) as rows in the corresponding database 
+            table, all at once (in a single batch, rather than one database 
+            operation per object).
+
+            Returns True if inserted, False if not.
+        '''
+
+        return _db().insert_many(cls, objs)
 
     def update(self, _id: tuple = ('id',)):
         '''
@@ -99,8 +158,7 @@ class Model:
             Return True if updated, False if not.
         '''
 
-        from dblib import update
-        return update(self, _id)
+        return _db().update(self, _id)
 
     @classmethod
     def select(cls, fields: tuple = ('*',), groups: tuple = None,
@@ -117,8 +175,7 @@ class Model:
             Returns list of rows if selected, None if not.
         '''
 
-        from dblib import select
-        return select(cls, fields, groups, orders, as_obj, **kwargs)
+        return _db().select(cls, fields, groups, orders, as_obj, **kwargs)
 
     @classmethod
     def select_page(cls, page: int, page_size: int, fields: tuple = ('*',),
@@ -136,9 +193,52 @@ class Model:
             Returns list of rows if selected, None if not.
         '''
 
-        from dblib import select_page
-        return select_page(cls, page, page_size, fields, orders, as_obj,
-                           **kwargs)
+        return _db().select_page(cls, page, page_size, fields, orders,
+                                 as_obj, **kwargs)
+
+    @classmethod
+    def select_after(cls, after: tuple, page_size: int,
+                     fields: tuple = ('*',), keys: tuple = ('id',),
+                     as_obj: bool = True, **kwargs):
+        '''
+            Select page_size row(s) coming after the keys values in after (in 
+            keys order) from the corresponding database table. If after is 
+            None, the first page_size row(s) are selected.
+
+            Unlike select_page, the cost of a page does not grow with its 
+            number, so it should be preferred for paging through large tables 
+            (with indexed keys, unique as a whole).
+
+            Filters can be applied through args and kwargs. Example:
+
+                >>> Request.select_after((1700000000.0, 'abc'), 15, keys=('hreq_at', 'id'), as_obj=False)
+
+            as_obj should only be set to True if fields is (*).
+
+            Returns list of rows if selected, None if not.
+        '''
+
+        return _db().select_after(cls, after, page_size, fields, keys,
+                                  as_obj, **kwargs)
+
+    @classmethod
+    def count(cls, max_age: float = None, **kwargs):
+        '''
+            Count rows in the corresponding database table.
+
+            Filters can be applied through args and kwargs. Example:
+
+                >>> Request.count(host=('=', '10.0.0.2'))
+
+            Counts are cached and reused for max_age seconds (0 to always 
+            count, default is the database library's COUNT_MAX_AGE).
+
+            Returns number of rows if counted, None if not.
+        '''
+
+        if max_age == None:
+            max_age = _db().COUNT_MAX_AGE
+        return _db().count(cls, max_age, **kwargs)
 
     @classmethod
     def as_csv(cls, abs_path: str = '', fields: tuple = ('*',),
@@ -153,8 +253,7 @@ class Model:
             Returns True if converted, False if not.
         '''
 
-        from dblib import as_csv
-        return as_csv(cls, abs_path, fields, orders, _suffix, **kwargs)
+        return _db().as_csv(cls, abs_path, fields, orders, _suffix, **kwargs)
 
     @classmethod
     def columns(cls):
@@ -162,8 +261,7 @@ class Model:
             Returns the list of columns in the corresponding database table.
         '''
 
-        from dblib import _get_columns
-        return _get_columns(cls)
+        return _db()._get_columns(cls)
 
 
 class InterfaceSpecs(Model):
@@ -189,10 +287,13 @@ class InterfaceSpecs(Model):
         timestamp: Default is time of update.
     '''
 
+    __slots__ = ('capacity', 'bandwidth_up', 'bandwidth_down', 'tx_packets',
+                 'rx_packets', 'tx_bytes', 'rx_bytes', 'timestamp')
+
     def __init__(self, capacity: float = 0, bandwidth_up: float = 0,
                  bandwidth_down: float = 0, tx_packets: int = 0,
                  rx_packets: int = 0, tx_bytes: int = 0, rx_bytes: int = 0,
-                 timestamp: float = 0):
+                 timestamp: float = None):
         self.capacity = capacity
         self.bandwidth_up = bandwidth_up
         self.bandwidth_down = bandwidth_down
@@ -200,7 +301,7 @@ class InterfaceSpecs(Model):
         self.rx_packets = rx_packets
         self.tx_bytes = tx_bytes
         self.rx_bytes = rx_bytes
-        self.timestamp = timestamp if timestamp else time()
+        self.timestamp = time() if timestamp == None else timestamp
 
 
 class Interface(Model):
@@ -223,6 +324,9 @@ class Interface(Model):
         specs: InterfaceSpecs object.
     '''
 
+    __slots__ = ('name', 'num', 'mac', 'ipv4', 'specs', '_iperf3_ip',
+                 '_recv_bps')
+
     def __init__(self, name: str, num: int = None, mac: str = None,
                  ipv4: str = None, specs: InterfaceSpecs = None):
         self.name = name
@@ -237,13 +341,12 @@ class Interface(Model):
         d = super().as_dict(flat, _prefix)
         if not flat:
             d['specs'] = self.specs.as_dict()
-        else:
-            if _prefix:
-                _prefix += '_'
-            del d[_prefix + 'specs']
-            d.update(self.specs.as_dict(flat, _prefix=_prefix+'specs'))
         return d
 
+    def _iter_flat(self, prefix: str):
+        yield from super()._iter_flat(prefix, ('specs',))
+        yield from self.specs._iter_flat(prefix + 'specs_')
+
     # the following methods serve for access to the interface specs no matter
     # how they are implemented (whether they are attributes in the object, are
     # objects themselves within an Iterable, etc.)
@@ -297,16 +400,34 @@ class Interface(Model):
         self.specs.rx_bytes = rx_bytes
         self.set_timestamp()
 
+    def set_measures(self, measures: dict):
+        '''
+            Set all measured specs at once from a dict of monitor measures 
+            (missing measures are set to None).
+        '''
+
+        get = measures.get
+        specs = self.specs
+        specs.capacity = get('capacity', None)
+        specs.bandwidth_up = get('bandwidth_up', None)
+        specs.bandwidth_down = get('bandwidth_down', None)
+        specs.tx_packets = get('tx_packets', None)
+        specs.rx_packets = get('rx_packets', None)
+        specs.tx_bytes = get('tx_bytes', None)
+        specs.rx_bytes = get('rx_bytes', None)
+        self.set_timestamp()
+
     def get_timestamp(self):
         return self.specs.timestamp
 
-    def set_timestamp(self, timestamp: float = 0.0):
-        self.specs.timestamp = timestamp if timestamp else time()
+    def set_timestamp(self, timestamp: float = None):
+        self.specs.timestamp = time() if timestamp == None else timestamp
 
 
-class NodeType(Enum):
+class NodeType:
     '''
-        Network node type enumeration.
+        Network node type enumeration (as plain strings, compared and 
+        serialized as is).
 
         Attributes:
         -----------
@@ -352,17 +473,20 @@ class NodeSpecs(Model):
         timestamp: Default is time of update.
     '''
 
+    __slots__ = ('cpu_count', 'cpu_free', 'memory_total', 'memory_free',
+                 'disk_total', 'disk_free', 'timestamp')
+
     def __init__(self, cpu_count: int = 0, cpu_free: float = 0.0,
                  memory_total: float = 0.0, memory_free: float = 0.0,
                  disk_total: float = 0.0, disk_free: float = 0.0,
-                 timestamp: float = 0.0):
+                 timestamp: float = None):
         self.cpu_count = cpu_count
         self.cpu_free = cpu_free
         self.memory_total = memory_total
         self.memory_free = memory_free
         self.disk_total = disk_total
         self.disk_free = disk_free
-        self.timestamp = timestamp if timestamp else time()
+        self.timestamp = time() if timestamp == None else timestamp
 
 
 class Node(Model):
@@ -378,7 +502,7 @@ class Node(Model):
 
         state: Node state boolean; True is up, False is down.
 
-        type: NodeType object.
+        type: NodeType value.
 
         label: Node name. Default is empty.
 
@@ -387,7 +511,7 @@ class Node(Model):
         specs: NodeSpecs object.
     '''
 
-    def __init__(self, id, state: bool, type: NodeType, label: str = None,
+    def __init__(self, id, state: bool, type: str, label: str = None,
                  interfaces: dict = None, specs: NodeSpecs = None):
         self.id = id
         self.state = state
@@ -402,20 +526,18 @@ class Node(Model):
 
     def as_dict(self, flat: bool = False):
         d = super().as_dict(flat)
-        d['type'] = self.type.value
         if not flat:
             d['specs'] = self.specs.as_dict()
             for name, intf in self.interfaces.items():
                 d['interfaces'][name] = intf.as_dict()
-        else:
-            del d['specs']
-            d.update(self.specs.as_dict(flat, _prefix='specs'))
-            del d['interfaces']
-            for name, intf in self.interfaces.items():
-                d.update(intf.as_dict(flat,
-                                      _prefix='interfaces_'+name))
         return d
 
+    def _iter_flat(self, prefix: str):
+        yield from super()._iter_flat(prefix, ('specs', 'interfaces'))
+        yield from self.specs._iter_flat(prefix + 'specs_')
+        for name, intf in self.interfaces.items():
+            yield from intf._iter_flat(prefix + 'interfaces_' + name + '_')
+
     # the following methods serve for access to the node specs no matter how
     # they are implemented (whether they are attributes in the object, are
     # objects themselves within an Iterable, etc.)
@@ -465,8 +587,8 @@ class Node(Model):
     def get_timestamp(self):
         return self.specs.timestamp
 
-    def set_timestamp(self, timestamp: float = 0.0):
-        self.specs.timestamp = timestamp if timestamp else time()
+    def set_timestamp(self, timestamp: float = None):
+        self.specs.timestamp = time() if timestamp == None else timestamp
 
 
 class CoSSpecs(Model):
@@ -498,6 +620,11 @@ class CoSSpecs(Model):
         min_disk: Default is 0.
     '''
 
+    __slots__ = ('max_response_time', 'min_concurrent_users',
+                 'min_requests_per_second', 'min_bandwidth', 'max_delay',
+                 'max_jitter', 'max_loss_rate', 'min_cpu', 'min_ram',
+                 'min_disk')
+
     def __init__(self,
                  max_response_time: float = float('inf'),
                  min_concurrent_users: float = 0.0,
@@ -546,13 +673,12 @@ class CoS(Model):
         d = super().as_dict(flat, _prefix)
         if not flat:
             d['specs'] = self.specs.as_dict()
-        else:
-            if _prefix:
-                _prefix += '_'
-            del d[_prefix + 'specs']
-            d.update(self.specs.as_dict(flat, _prefix=_prefix+'specs'))
         return d
 
+    def _iter_flat(self, prefix: str):
+        yield from super()._iter_flat(prefix, ('specs',))
+        yield from self.specs._iter_flat(prefix + 'specs_')
+
     # the following methods serve for access to the CoS specs no matter how
     # they are implemented (whether they are attributes in the object, are
     # objects themselves within an Iterable, etc.)
@@ -645,11 +771,14 @@ class Request(Model):
 
         dres_at: Data exchange response timestamp (end of operation).
 
-        attempts: Dict of request Attempts (keys are attempt numbers).
+        attempts: List of request Attempts (in order of attempt numbers, 
+        starting from 1).
 
         Methods:
         --------
         new_attempt(): Create new attempt.
+
+        get_attempt(attempt_no): Returns Attempt of attempt_no, or None.
     '''
 
     _states = {
@@ -662,7 +791,7 @@ class Request(Model):
 
     def __init__(self, id, cos: CoS, data: bytes, result: bytes = None,
                  host: str = None, state: int = None, hreq_at: float = None,
-                 dres_at: float = None, attempts: dict = None):
+                 dres_at: float = None, attempts: list = None):
         self.id = id
         self.cos = cos
         self.data = data
@@ -671,38 +800,45 @@ class Request(Model):
         self.state = state
         self.hreq_at = hreq_at
         self.dres_at = dres_at
-        self.attempts = attempts if attempts != None else {}
-        self._attempt_no = 0
+        self.attempts = attempts if attempts != None else []
         self._late = False
 
-    def _t(self, x):
-        return datetime.fromtimestamp(x) if x != None else x
+    # attributes in dictionaries (in order)
+    _fields = ('id', 'cos', 'data', 'result', 'host', 'state', 'hreq_at',
+               'dres_at', 'attempts')
+
+    _repr_format = ('\nrequest(id=%s, state=(%s), cos=%s, host=%s, '
+                    'hreq_at=%s, dres_at=%s)\n')
+
+    # timestamp as local date and time (to the second), or None
+    def _t(self, x, _fromtimestamp=datetime.fromtimestamp):
+        if x == None:
+            return x
+        return _fromtimestamp(x).isoformat(' ', 'seconds')
 
     def __repr__(self):
-        return ('\nrequest(id=%s, state=(%s), cos=%s, host=%s, hreq_at=%s, '
-                'dres_at=%s)\n' % (
-                    self.id,
-                    self._states[self.state] if self.state in self._states
-                    else str(self.state),
-                    self.cos.name, self.host, self._t(self.hreq_at),
-                    self._t(self.dres_at)))
+        return self._repr_format % (
+            self.id, self._states.get(self.state, self.state), self.cos.name,
+            self.host, self._t(self.hreq_at), self._t(self.dres_at))
 
     def as_dict(self, flat: bool = False):
         d = super().as_dict(flat)
-        del d['_late']
         if not flat:
             d['cos'] = self.cos.as_dict()
-            for attempt_no, attempt in self.attempts.items():
-                d['attempts'][attempt_no] = attempt.as_dict()
-        else:
-            del d['cos']
-            d.update(self.cos.as_dict(flat, _prefix='cos'))
-            del d['attempts']
-            for attempt_no, attempt in self.attempts.items():
-                d.update(attempt.as_dict(flat,
-                                         _prefix='attempts_'+str(attempt_no)))
+            d['attempts'] = {attempt.attempt_no: attempt.as_dict()
+                             for attempt in self.attempts}
         return d
 
+    def _items(self):
+        return ((key, getattr(self, key)) for key in self._fields)
+
+    def _iter_flat(self, prefix: str):
+        yield from super()._iter_flat(prefix, ('cos', 'attempts'))
+        yield from self.cos._iter_flat(prefix + 'cos_')
+        for attempt in self.attempts:
+            yield from attempt._iter_flat(
+                prefix + 'attempts_' + str(attempt.attempt_no) + '_')
+
     def new_attempt(self):
         '''
             Create a new attempt.
@@ -710,11 +846,19 @@ class Request(Model):
             Returns Attempt object.
         '''
 
-        self._attempt_no += 1
-        attempt = Attempt(self.id, self._attempt_no)
-        self.attempts[self._attempt_no] = attempt
+        attempt = Attempt(self.id, len(self.attempts) + 1)
+        self.attempts.append(attempt)
         return attempt
 
+    def get_attempt(self, attempt_no: int):
+        '''
+            Returns Attempt object of attempt_no if it exists, None if not.
+        '''
+
+        if 0 < attempt_no <= len(self.attempts):
+            return self.attempts[attempt_no - 1]
+        return None
+
     # the following methods serve for access to the CoS specs no matter how
     # they are implemented (whether they are attributes in the object, are
     # objects themselves within an Iterable, etc.)
@@ -777,6 +921,9 @@ class Attempt(Model):
         responses: Dict of attempt Responses (keys are responding hosts IPs).
     '''
 
+    __slots__ = ('req_id', 'attempt_no', 'host', 'state', 'hreq_at',
+                 'hres_at', 'rres_at', 'dres_at', 'responses')
+
     def __init__(self, req_id, attempt_no: int, host: str = None,
                  state: int = None, hreq_at: float = None,
                  hres_at: float = None, rres_at: float = None,
@@ -796,13 +943,14 @@ class Attempt(Model):
         if not flat:
             for host, response in self.responses.items():
                 d['responses'][host] = response.as_dict()
-        else:
-            del d['responses']
-            for host, response in self.responses.items():
-                d.update(response.as_dict(flat,
-                                          _prefix='responses_'+str(host)))
         return d
 
+    def _iter_flat(self, prefix: str):
+        yield from super()._iter_flat(prefix, ('responses',))
+        for host, response in self.responses.items():
+            yield from response._iter_flat(
+                prefix + 'responses_' + str(host) + '_')
+
 
 class Response(Model):
     '''
@@ -825,12 +973,16 @@ class Response(Model):
         timestamp: Response timestamp.
     '''
 
+    __slots__ = ('req_id', 'attempt_no', 'host', 'cpu', 'ram', 'disk',
+                 'timestamp')
+
     def __init__(self, req_id, attempt_no: int, host: str, cpu: float = None,
-                 ram: float = None, disk: float = None, timestamp: float = 0):
+                 ram: float = None, disk: float = None,
+                 timestamp: float = None):
         self.req_id = req_id
         self.attempt_no = attempt_no
         self.host = host
         self.cpu = cpu
         self.ram = ram
         self.disk = disk
-        self.timestamp = timestamp if timestamp else time()
+        self.timestamp = time() if timestamp == None else timestamp
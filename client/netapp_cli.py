@@ -3,9 +3,24 @@
 '''
 
 
-from threading import Thread
+from os import read
+from atexit import register
+from threading import Event
+from sys import stdin
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, Future
 
 from consts import MODE_RESOURCE
+from logger import console, file
+
+
+# max number of requests sent concurrently from the CLI (requests typed
+# beyond that wait for a worker instead of each spawning a new thread; more
+# would only wait for one of the server API connections anyway)
+CLI_WORKERS = 4
+
+# data sent with every request
+PAYLOAD = b'data + program'
 
 
 def _list_cos(cos_names: dict):
@@ -18,30 +33,70 @@ def _list_cos(cos_names: dict):
     print()
 
 
-def _send_request(send_request, cos_names, cos_id: int, data: bytes):
-    print(send_request(cos_id=cos_id, data=data))
+# sent as soon as a worker is free, and printed as soon as it is done (not
+# after requests sent before it)
+def _send(send_request, cos_names: dict, pool: ThreadPoolExecutor,
+          cos_id: int):
+    future = pool.submit(send_request, cos_id=cos_id, data=PAYLOAD)
+    future.add_done_callback(partial(_print_result, cos_names))
+    return future
+
+
+def _print_result(cos_names: dict, future: Future):
+    try:
+        print(future.result())
+    except Exception as e:
+        console.error('Request failed due to %s', e.__class__.__name__)
+        file.exception('Request failed due to %s', e.__class__.__name__)
     _list_cos(cos_names)
 
 
+def _parse(line: str, cos_names: dict, valid_ids: frozenset):
+    cos_id = line.strip()
+    if cos_id == '':
+        cos_id = 1
+    try:
+        cos_id = int(cos_id)
+    except:
+        print('Invalid CoS ID')
+        _list_cos(cos_names)
+    else:
+        if cos_id not in valid_ids:
+            print('This CoS doesn\'t exist')
+            _list_cos(cos_names)
+        else:
+            return cos_id
+
+
 def netapp_cli(mode: str, send_request, cos_names: dict):
     print('\nChoose a Class of Service and click ENTER to send a request')
     if mode == MODE_RESOURCE:
         print('Or wait to receive requests')
     _list_cos(cos_names)
+    pool = ThreadPoolExecutor(max_workers=CLI_WORKERS,
+                              thread_name_prefix='cli-send')
+    register(pool.shutdown, wait=False)
+    # a raw read blocks until stdin has data, then takes all the lines
+    # available at once (e.g. when piped), so they are sent together;
+    # unlike a selector, this also works when stdin is a regular file or
+    # /dev/null
+    valid_ids = frozenset(cos_names)
+    buffer = b''
     while True:
-        cos_id = input()
-        if cos_id == '':
-            cos_id = 1
-        try:
-            cos_id = int(cos_id)
-        except:
-            print('Invalid CoS ID')
-            _list_cos(cos_names)
+        chunk = read(stdin.fileno(), 4096)
+        if not chunk:
+            # stdin closed (the last line may have no line break)
+            lines = [buffer] if buffer else []
         else:
-            if cos_id not in cos_names:
-                print('This CoS doesn\'t exist')
-                _list_cos(cos_names)
-            else:
-                Thread(target=_send_request,
-                       args=(send_request, cos_names,
-                             cos_id, b'data + program'), daemon=True).start()
+            *lines, buffer = (buffer + chunk).split(b'\n')
+        for line in lines:
+            cos_id = _parse(line.decode(errors='replace'), cos_names,
+                            valid_ids)
+            if cos_id != None:
+                _send(send_request, cos_names, pool, cos_id)
+        if not chunk:
+            break
+    # requests already read are all sent, then the node keeps running (as
+    # with an idle terminal) until it is stopped
+    pool.shutdown(wait=True)
+    Event().wait()
@@ -184,7 +184,7 @@ class MyProtocolAM(AnsweringMachine):
         _req = requests_.get(_req_id, None)
         my_req = requests.get(req_id, None)
         if my_req:
-            att = my_req.attempts.get(att_no, None)
+            att = my_req.get_attempt(att_no)
 
         # provider receives host request
         if state == HREQ and IS_RESOURCE:
@@ -223,7 +223,7 @@ class MyProtocolAM(AnsweringMachine):
         _req = requests_.get(_req_id, None)
         my_req = requests.get(req_id, None)
         if my_req:
-            att = my_req.attempts.get(att_no, None)
+            att = my_req.get_attempt(att_no)
 
         # provider receives resource reservation request
         if state == RREQ and ip_src == ORCH_IP and IS_RESOURCE:
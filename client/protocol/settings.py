@@ -8,24 +8,25 @@ from string import ascii_letters, digits
 from random import choice
 
 from model import CoS, Request, Attempt, Response
-from api import add_request
+from api import add_request_async
 from logger import console, file
 from network import MY_IP
+from utils import getenv_bool
 from consts import *
 
 
 # protocol config
 PROTO_NAME = 'MyProtocol'
 
-_stp_enabled = getenv('NETWORK_STP_ENABLED', '').upper()
-if _stp_enabled not in ('TRUE', 'FALSE'):
+STP_ENABLED = getenv_bool('NETWORK_STP_ENABLED')
+if STP_ENABLED == None:
     console.warning('NETWORK:STP_ENABLED parameter invalid or missing from '
                     'received configuration. '
                     'Defaulting to False')
     file.warning('NETWORK:STP_ENABLED parameter (%s) invalid or missing '
-                 'from received configuration', _stp_enabled)
-    _stp_enabled = 'FALSE'
-STP_ENABLED = _stp_enabled == 'TRUE'
+                 'from received configuration',
+                 getenv('NETWORK_STP_ENABLED', None))
+    STP_ENABLED = False
 
 _proto_send_to = getenv('PROTOCOL_SEND_TO', None)
 if (_proto_send_to not in (SEND_TO_BROADCAST,
@@ -62,10 +63,7 @@ except:
                  'received configuration', exc_info=True)
     PROTO_RETRIES = 3
 
-_proto_verbose = getenv('PROTOCOL_VERBOSE', '').upper()
-if _proto_verbose not in ('TRUE', 'FALSE'):
-    _proto_verbose = 'FALSE'
-PROTO_VERBOSE = _proto_verbose == 'TRUE'
+PROTO_VERBOSE = getenv_bool('PROTOCOL_VERBOSE') == True
 
 cos_dict = {cos.id: cos for cos in CoS.select()}
 cos_names = {id: cos.name for id, cos in cos_dict.items()}
@@ -111,10 +109,11 @@ def gen_req_id():
 
 def save_req(req: Request):
     req.insert()
-    for attempt in req.attempts.values():
-        attempt.insert()
-        for response in attempt.responses.values():
-            response.insert()
+    # attempts and responses are inserted in batches
+    Attempt.insert_many(req.attempts)
+    Response.insert_many([response
+                          for attempt in req.attempts
+                          for response in attempt.responses.values()])
 
     # save locally
     # if simulation is active (like mininet), create different CSV files for
@@ -124,8 +123,16 @@ def save_req(req: Request):
     Attempt.as_csv(orders=('hreq_at',), _suffix=_suffix)
     Response.as_csv(orders=('timestamp',), _suffix=_suffix)
 
-    #  send request to server (for logging)
-    sent, *code = add_request(req)
+    # send request to server (for logging) in the background, so the caller
+    # doesn't wait for the orchestrator's reply
+    add_request_async(req).add_done_callback(_add_request_done)
+
+
+def _add_request_done(future):
+    try:
+        sent, *code = future.result()
+    except Exception as e:
+        sent, code = False, [None, e.__class__.__name__]
     if not sent:
         console.error('Request info failed to send to server for logging %s. '
                       'Only saved locally.', str(code))
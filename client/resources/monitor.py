@@ -3,7 +3,7 @@
 # method is called, so only import after
 
 
-from os import getenv, makedirs
+from os import getenv, makedirs, open as os_open, close, pread, O_RDONLY
 from threading import Thread
 from time import sleep
 from psutil import (net_if_stats, net_io_counters, cpu_count, cpu_percent,
@@ -23,6 +23,8 @@ from utils import SingletonMeta
 
 IS_CONTAINER = getenv('IS_CONTAINER', False)
 CGROUP_PATH = '/sys/fs/cgroup'
+# max size read from cgroup files (enough for hundreds of CPUs)
+CGROUP_READ_SIZE = 16384
 
 CAPS_PATH = ROOT_PATH + '/caps'
 
@@ -31,7 +33,7 @@ MEBI = 1048576
 GIGA = 10e+9
 GIBI = 1073741824
 BYTE = 8
-NANO = 10e-9
+NANO = 1e-9
 
 
 class Monitor(metaclass=SingletonMeta):
@@ -83,6 +85,8 @@ class Monitor(metaclass=SingletonMeta):
         self._run = False
         self._cpu_period = 0.1
         self._ovs_port_to_iface = {}
+        self._cgroup_fds = {}
+        self._psutil_cpus = cpu_count()
 
     def start(self):
         '''
@@ -122,6 +126,7 @@ class Monitor(metaclass=SingletonMeta):
             io2 = self._var_net(io)
             # update network I/O stats for next iteration
             io = io2
+        self._close_cgroup()
 
     def _const_host(self):
         # get host specs that are constant
@@ -132,9 +137,8 @@ class Monitor(metaclass=SingletonMeta):
         if IS_CONTAINER:
             # get usage of each CPU (in nanoseconds)
             try:
-                percpu = open(
-                    CGROUP_PATH + '/cpu/cpuacct.usage_percpu').read().split(' ')
-                cpus = len(percpu) - 1  # don't count '\n'
+                percpu = self._read_cgroup('/cpu/cpuacct.usage_percpu').split()
+                cpus = len(percpu)
             except Exception as e:
                 cpus = cpu_count()
                 console.error('Unable to read Docker control group for CPU '
@@ -171,37 +175,54 @@ class Monitor(metaclass=SingletonMeta):
             sleep(self._cpu_period)
             # get CPU usage again after sleep
             try:
-                percpu_2 = open(
-                    CGROUP_PATH + '/cpu/cpuacct.usage_percpu').read().split(' ')
+                percpu_2 = self._read_cgroup(
+                    '/cpu/cpuacct.usage_percpu').split()
+                # usage is summed in nanoseconds, then converted to CPUs
                 cpu_usage = 0
                 for i, cpu in enumerate(percpu):
-                    if cpu != '\n':
-                        cpu_usage += ((float(percpu_2[i]) - float(cpu)) /
-                                      (self._cpu_period / NANO))
+                    cpu_usage += int(percpu_2[i]) - int(cpu)
+                cpu_usage *= NANO / self._cpu_period
                 self.measures['cpu_free'] = max(
                     0.0, float(self.measures['cpu_count'] - cpu_usage))
             except:
                 file.exception('')
-                self.measures['cpu_free'] = max(
-                    0.0, float(self.measures['cpu_count'] - sum(
-                        cpu_percent(interval=self._cpu_period, percpu=True)) / 100))
+                self.measures['cpu_free'] = self._psutil_cpu_free()
             try:
                 self.measures['memory_free'] = float(
-                    self.measures['memory_total'] - float(open(
-                        CGROUP_PATH + '/memory/memory.usage_in_bytes').read()) / MEBI)
+                    self.measures['memory_total'] - float(self._read_cgroup(
+                        '/memory/memory.usage_in_bytes')) / MEBI)
             except:
                 file.exception('')
                 self.measures['memory_free'] = float(
                     virtual_memory().available / MEBI)
         else:
-            self.measures['cpu_free'] = max(
-                0.0, float(self.measures['cpu_count'] - sum(
-                    cpu_percent(interval=self._cpu_period, percpu=True)) / 100))
+            self.measures['cpu_free'] = self._psutil_cpu_free()
             self.measures['memory_free'] = float(
                 virtual_memory().available / MEBI)
         self.measures['disk_free'] = float(disk_usage(ROOT_PATH).free / GIBI)
         return percpu_2
 
+    # free CPUs according to psutil (the system-wide percentage is the mean
+    # of the per-CPU percentages, so it is scaled back to CPUs used)
+    def _psutil_cpu_free(self):
+        cpu_usage = (cpu_percent(interval=self._cpu_period) / 100
+                     * self._psutil_cpus)
+        return max(0.0, float(self.measures['cpu_count'] - cpu_usage))
+
+    # read cgroup file from the start, through a descriptor kept open (cgroup
+    # files are regenerated on each read, so no need to reopen them)
+    def _read_cgroup(self, path: str):
+        fd = self._cgroup_fds.get(path, None)
+        if fd == None:
+            fd = os_open(CGROUP_PATH + path, O_RDONLY)
+            self._cgroup_fds[path] = fd
+        return pread(fd, CGROUP_READ_SIZE, 0)
+
+    def _close_cgroup(self):
+        for fd in self._cgroup_fds.values():
+            close(fd)
+        self._cgroup_fds.clear()
+
     def _const_net(self):
         # get network specs that are constant
         # (capacity)
@@ -296,52 +317,49 @@ class Monitor(metaclass=SingletonMeta):
 
         # get network I/O stats on each interface again after period
         io_2 = net_io_counters(pernic=True)
-        ports = io
+        # interfaces present in both stats (except loopback)
+        ifaces = io.keys() & io_2.keys()
+        ifaces.discard('lo')
         if IS_SWITCH:
-            ports = self._ovs_port_to_iface
+            ports = [(port, iface)
+                     for port, iface in self._ovs_port_to_iface.items()
+                     if port != 'lo' and iface in ifaces]
         else:
+            ports = [(iface, iface) for iface in ifaces]
             try:
                 launch_iw()
             except:
                 pass
-        for port in ports:
-            iface = port
-            if IS_SWITCH:
-                iface = self._ovs_port_to_iface[port]
-            if port != 'lo' and iface != 'lo' and iface in io_2:
-                # bandwidth
-                # speed = (new bytes - old bytes) / period
-                prev = io[iface]
-                next = io_2[iface]
-                bytes_sent = next.bytes_sent
-                bytes_recv = next.bytes_recv
-                up_bytes = bytes_sent - prev.bytes_sent
-                up_speed = up_bytes * BYTE / self.monitor_period
-                down_bytes = bytes_recv - prev.bytes_recv
-                down_speed = down_bytes * BYTE / self.monitor_period
-                #  get max speed (capacity)
-                max_speed = 0
-                if iface in iw_dict:
-                    max_speed = iw_dict[iface].get('tx bitrate', None)
-                    try:
-                        max_speed = float(max_speed.strip(' MBit/s'))
-                    except:
-                        max_speed = 0
-                    self.measures.setdefault(port, {})
-                    self.measures[port]['capacity'] = max_speed
-                if port in self.measures:
-                    max_speed = self.measures[port]['capacity'] * MEGA
-                # calculate free bandwidth
-                bandwidth_up = max(0, (max_speed - up_speed) / MEGA)
-                bandwidth_down = max(0, (max_speed - down_speed) / MEGA)
-                #  save bandwidth measurement
-                self.measures.setdefault(port, {})
-                self.measures[port]['bandwidth_up'] = float(bandwidth_up)
-                self.measures[port]['bandwidth_down'] = float(bandwidth_down)
-                self.measures[port]['tx_packets'] = int(next.packets_sent)
-                self.measures[port]['rx_packets'] = int(next.packets_recv)
-                self.measures[port]['tx_bytes'] = int(bytes_sent)
-                self.measures[port]['rx_bytes'] = int(bytes_recv)
+        measures = self.measures
+        # converts bytes per period to bits per second
+        scale = BYTE / self.monitor_period
+        for port, iface in ports:
+            # bandwidth
+            # speed = (new bytes - old bytes) / period
+            prev = io[iface]
+            next = io_2[iface]
+            bytes_sent = next.bytes_sent
+            bytes_recv = next.bytes_recv
+            up_speed = (bytes_sent - prev.bytes_sent) * scale
+            down_speed = (bytes_recv - prev.bytes_recv) * scale
+            port_measures = measures.setdefault(port, {})
+            #  get max speed (capacity)
+            if iface in iw_dict:
+                max_speed = iw_dict[iface].get('tx bitrate', None)
+                try:
+                    max_speed = float(max_speed.strip(' MBit/s'))
+                except:
+                    max_speed = 0
+                port_measures['capacity'] = max_speed
+            max_speed = port_measures.get('capacity', 0) * MEGA
+            # calculate free bandwidth and save measurements
+            port_measures.update(
+                bandwidth_up=float(max(0, (max_speed - up_speed) / MEGA)),
+                bandwidth_down=float(max(0, (max_speed - down_speed) / MEGA)),
+                tx_packets=int(next.packets_sent),
+                rx_packets=int(next.packets_recv),
+                tx_bytes=int(bytes_sent),
+                rx_bytes=int(bytes_recv))
         return io_2
 
 
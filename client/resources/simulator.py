@@ -40,7 +40,7 @@ from .monitor import Monitor
 from common import THRESHOLD, LIMIT, IS_RESOURCE
 from model import Request
 from logger import console, file
-from utils import all_exit
+from utils import all_exit, getenv_bool
 
 
 try:
@@ -66,15 +66,14 @@ while ('cpu_count' not in MEASURES
        or 'disk_free' not in MEASURES):
     sleep(0.1)
 
-_sim_on = getenv('SIMULATOR_ACTIVE', '').upper()
-if _sim_on not in ('TRUE', 'FALSE'):
+SIM_ON = getenv_bool('SIMULATOR_ACTIVE')
+if SIM_ON == None:
     console.warning('SIMULATOR:ACTIVE parameter invalid or missing from '
                     'received configuration. '
                     'Defaulting to False')
     file.warning('SIMULATOR:ACTIVE parameter (%s) invalid or missing from '
-                 'received configuration', _sim_on)
-    _sim_on = 'FALSE'
-SIM_ON = _sim_on == 'TRUE'
+                 'received configuration', getenv('SIMULATOR_ACTIVE', None))
+    SIM_ON = False
 
 _cpu = 0
 _ram = 0
@@ -1,4 +1,6 @@
+from os import getenv
 from threading import Lock
+from time import monotonic
 from socket import socket, AF_INET, SOCK_DGRAM, SOCK_STREAM
 from psutil import net_if_addrs
 from ipaddress import ip_address, ip_network
@@ -34,6 +36,27 @@ class SingletonMeta(type):
         return cls._instances[cls]
 
 
+# (timestamp, addresses) of the last net_if_addrs() call
+_if_addrs = (None, {})
+_if_addrs_lock = Lock()
+
+
+def cached_net_if_addrs(ttl: float = 30.0):
+    '''
+        Returns the result of psutil's net_if_addrs(), gotten again only if 
+        the cached one is older than ttl seconds.
+    '''
+
+    global _if_addrs
+    with _if_addrs_lock:
+        at, addrs = _if_addrs
+        now = monotonic()
+        if at == None or now - at > ttl:
+            addrs = net_if_addrs()
+            _if_addrs = (now, addrs)
+        return addrs
+
+
 def get_iface(network: str):
     '''
         Returns interface name from given network address.
@@ -43,7 +66,7 @@ def get_iface(network: str):
         net = ip_network(network)
     except:
         net = []
-    for name, iface in net_if_addrs().items():
+    for name, iface in cached_net_if_addrs().items():
         for addr in iface:
             if addr.family == AF_INET and ip_address(addr.address) in net:
                 return name
@@ -79,7 +102,7 @@ def get_ip(network: str = None, interface: str = None):
     name = interface
     if network != None:
         name = get_iface(network)
-    for addr in net_if_addrs().get(name, []):
+    for addr in cached_net_if_addrs().get(name, []):
         if addr.family == AF_INET:
             return addr.address
     return get_default_ip()
@@ -100,5 +123,43 @@ def port_open(ip: str, port: int):
         s.close()
 
 
+def getenv_bool(name: str):
+    '''
+        Returns True if environment variable name is 'true', False if it is 
+        'false' (case-insensitive), None if it is missing or invalid.
+    '''
+
+    value = getenv(name, '').upper()
+    if value == 'TRUE':
+        return True
+    if value == 'FALSE':
+        return False
+    return None
+
+
+def getenv_int(name: str):
+    '''
+        Returns environment variable name as int, None if it is missing or 
+        invalid.
+    '''
+
+    try:
+        return int(getenv(name, None))
+    except:
+        return None
+
+
+def getenv_float(name: str):
+    '''
+        Returns environment variable name as float, None if it is missing or 
+        invalid.
+    '''
+
+    try:
+        return float(getenv(name, None))
+    except:
+        return None
+
+
 def all_exit():
     sys_exit()
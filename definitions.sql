@@ -37,6 +37,9 @@ create table if not exists requests (
     references cos (id)  
 );
 
+-- requests are paged in order of hreq_at (then id)
+create index if not exists requests_hreq_at on requests (hreq_at, id);
+
 -- =================================
 --     Attempts table definition    
 -- =================================
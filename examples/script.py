@@ -6,7 +6,7 @@ from logging import INFO, WARNING
 from context import *
 from client.consts import MODE_CLIENT, MODE_RESOURCE
 from client.client import connect
-from client.logger import console, file
+from client.logger import console, file, set_console_level
 from client.utils import all_exit
 
 
@@ -15,7 +15,7 @@ if _verbose not in ('TRUE', 'FALSE'):
     _verbose = 'FALSE'
 VERBOSE = _verbose == 'TRUE'
 
-console.setLevel(INFO if VERBOSE else WARNING)
+set_console_level(INFO if VERBOSE else WARNING)
 
 MODE = getenv('MODE', None)
 _MODES = (MODE_CLIENT, MODE_RESOURCE)
@@ -1,5 +1,19 @@
 from sys import path
+from os import environ
 from os.path import dirname, abspath, join
+from importlib import import_module
+from tempfile import mkdtemp
 
 
 path.insert(0, abspath(join(dirname(__file__), '..')))
+
+# config that is only present after the connect() method is called
+environ.setdefault('SERVER_IP', '127.0.0.1')
+environ.setdefault('SERVER_API_PORT', '8080')
+environ.setdefault('DATABASE_COS', "[{'id': 1, 'name': 'best-effort'}]")
+
+# (imported once path and config are set)
+client = import_module('client')
+
+# tests use a database of their own (opened on first use)
+import_module('dblib').DB_PATH = join(mkdtemp(), 'database.db')
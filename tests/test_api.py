@@ -0,0 +1,147 @@
+from unittest import TestCase, main
+from concurrent.futures import Future
+from json import loads
+
+from .context import client
+
+import api
+from consts import HTTP_SUCCESS, HTTP_EXISTS, HTTP_NOT_FOUND
+
+
+class _Response:
+    def __init__(self, status_code: int, content: bytes = b''):
+        self.status_code = status_code
+        self.content = content
+
+
+class _Session:
+    def __init__(self, response: _Response):
+        self.response = response
+        self.posts = []
+
+    def post(self, url, data=None, timeout=None):
+        self.posts.append((url, data))
+        return self.response
+
+
+def _ops(n: int):
+    return [('PUT', '/node_specs/' + str(i), b'{"i":' + str(i).encode() + b'}',
+             Future()) for i in range(n)]
+
+
+class TestRyuBatch(TestCase):
+    def setUp(self):
+        self._session = api._session
+        api._batch_supported = True
+
+    def tearDown(self):
+        api._session = self._session
+        api._batch_supported = True
+
+    def test_demux(self):
+        api._session = _Session(_Response(HTTP_SUCCESS, (
+            '{"results":[[%d,"ok"],[%d,"exists"],[500,"error"]]}'
+            % (HTTP_SUCCESS, HTTP_EXISTS)).encode()))
+        ops = _ops(3)
+        self.assertTrue(api._ryu_batch(ops))
+        url, data = api._session.posts[0]
+        self.assertTrue(url.endswith('/batch'))
+        self.assertEqual(loads(data)['ops'][1], {
+            'method': 'PUT', 'path': '/node_specs/1', 'data': {'i': 1}})
+        self.assertEqual([op[3].result() for op in ops], [
+            (True, HTTP_SUCCESS, 'ok'),
+            (True, HTTP_EXISTS, 'exists'),
+            (False, 500, 'error')])
+
+    def test_results_mismatch(self):
+        api._session = _Session(_Response(HTTP_SUCCESS, (
+            b'{"results":[[200,"ok"]]}')))
+        ops = _ops(2)
+        self.assertFalse(api._ryu_batch(ops))
+        self.assertFalse(any(op[3].done() for op in ops))
+        self.assertTrue(api._batch_supported)
+
+    def test_not_supported(self):
+        api._session = _Session(_Response(HTTP_NOT_FOUND))
+        self.assertFalse(api._ryu_batch(_ops(2)))
+        self.assertFalse(api._batch_supported)
+        # not tried again
+        self.assertFalse(api._ryu_batch(_ops(2)))
+        self.assertEqual(len(api._session.posts), 1)
+
+    def test_fallback_skips_resolved(self):
+        sent = []
+        _ryu_request = api._ryu_request
+        api._ryu_request = lambda method, path, data=None: (
+            sent.append(path) or (True, HTTP_SUCCESS, ''))
+        try:
+            api._batch_supported = False
+            ops = _ops(3)
+            ops[1][3].set_result((True, HTTP_SUCCESS, ''))
+            queue = api.Queue()
+            for op in ops:
+                queue.put(op)
+            queue.put(None)
+            executor = api.ThreadPoolExecutor(max_workers=1)
+            api._ryu_flush(queue, executor)
+            executor.shutdown(wait=True)
+        finally:
+            api._ryu_request = _ryu_request
+        self.assertEqual(sorted(sent), ['/node_specs/0', '/node_specs/2'])
+        self.assertTrue(all(op[3].done() for op in ops))
+
+
+class TestPartialSpecs(TestCase):
+    def _specs(self, cpu_free: float, eth0_up: float, eth1_up: float):
+        return {
+            'cpu_free': cpu_free,
+            'memory_free': 1.0,
+            'interfaces': [
+                {'name': 'eth0', 'bandwidth_up': eth0_up, 'capacity': 10.0},
+                {'name': 'eth1', 'bandwidth_up': eth1_up, 'capacity': 10.0}
+            ]
+        }
+
+    def test_changed_only(self):
+        last = self._specs(0.5, 1.0, 2.0)
+        specs = self._specs(0.25, 1.0, 3.0)
+        payload = api._partial_specs_payload('test-partial', last, specs)
+        self.assertEqual(payload['cpu_free'], 0.25)
+        self.assertNotIn('memory_free', payload)
+        self.assertEqual(payload['interfaces'],
+                         [{'name': 'eth1', 'bandwidth_up': 3.0}])
+        self.assertTrue(payload['partial'])
+
+    def test_new_interface(self):
+        last = self._specs(0.5, 1.0, 2.0)
+        specs = self._specs(0.5, 1.0, 2.0)
+        specs['interfaces'].append({'name': 'eth2', 'capacity': 10.0})
+        payload = api._partial_specs_payload('test-new-iface', last, specs)
+        self.assertEqual(payload['interfaces'],
+                         [{'name': 'eth2', 'capacity': 10.0}])
+
+    def test_seq(self):
+        last = self._specs(0.5, 1.0, 2.0)
+        seqs = [api._partial_specs_payload('test-seq', last, last)['seq']
+                for _ in range(3)]
+        self.assertEqual(seqs, [seqs[0], seqs[0] + 1, seqs[0] + 2])
+
+    def _done(self, node_id, specs: dict, result):
+        future = Future()
+        api._inflight_specs[node_id] = [future, None, None]
+        future.set_result(result)
+        api._ryu_update_node_specs_done(node_id, specs, future)
+
+    def test_baseline_acknowledged(self):
+        # specs only become the baseline once the orchestrator has them
+        first = self._specs(0.5, 1.0, 2.0)
+        second = self._specs(0.25, 1.0, 2.0)
+        self._done('test-ack', first, (True, HTTP_SUCCESS, ''))
+        self._done('test-ack', second, (False, 500, 'error'))
+        self.assertIs(api._last_specs['test-ack'], first)
+        self._done('test-ack', second, (True, HTTP_SUCCESS, ''))
+        self.assertIs(api._last_specs['test-ack'], second)
+
+
+if __name__ == '__main__':
+    main()
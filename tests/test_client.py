@@ -0,0 +1,23 @@
+from unittest import TestCase, main
+from ipaddress import ip_address
+
+from .context import client
+
+from client.client import _IPV4_RE
+
+
+class TestIPv4Pattern(TestCase):
+    def test_canonical(self):
+        for ip in ('0.0.0.0', '10.0.0.1', '192.168.1.254', '255.255.255.255'):
+            self.assertTrue(_IPV4_RE.fullmatch(ip), ip)
+            self.assertEqual(ip_address(ip).exploded, ip)
+
+    def test_not_canonical(self):
+        # left to ip_address (which rejects them or writes them canonically)
+        for ip in ('010.0.0.1', '256.0.0.1', '10.0.0', '10.0.0.1\n',
+                   ' 10.0.0.1', '١.٢.٣.٤', '::1'):
+            self.assertFalse(_IPV4_RE.fullmatch(ip), repr(ip))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+from unittest import TestCase, main
+
+from .context import client
+
+import dblib
+from model import Request, CoS
+
+
+KEYS = ('hreq_at', 'id')
+
+
+def _insert(prefix: str, hreq_ats: list):
+    cos = CoS(1, 'best-effort')
+    reqs = [Request(prefix + str(i), cos, b'data', hreq_at=hreq_at)
+            for i, hreq_at in enumerate(hreq_ats)]
+    dblib.insert_many(Request, reqs)
+    return [req.id for req in reqs]
+
+
+class TestSelectAfter(TestCase):
+    def test_pages(self):
+        # equal hreq_at values are told apart by id
+        ids = _insert('after-', [103.0, 101.0, 102.0, 102.0, 100.0])
+        expected = [row[0] for row in sorted(
+            dblib.select(Request, ('id', 'hreq_at'), as_obj=False,
+                         id=('in', ids)),
+            key=lambda row: (row[1], row[0]))]
+        pages = []
+        after = None
+        while True:
+            rows = dblib.select_after(Request, after, 2, ('id', 'hreq_at'),
+                                      KEYS, as_obj=False, id=('in', ids))
+            if not rows:
+                break
+            pages.append([row[0] for row in rows])
+            after = (rows[-1][1], rows[-1][0])
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_same_as_select_page(self):
+        ids = _insert('page-', [200.0, 202.0, 201.0, 203.0])
+        first = dblib.select_after(Request, None, 2, ('id',), KEYS,
+                                   as_obj=False, id=('in', ids))
+        self.assertEqual(first, dblib.select_page(
+            Request, 1, 2, ('id',), KEYS, as_obj=False, id=('in', ids)))
+        second = dblib.select_after(Request, (201.0, 'page-2'), 2, ('id',),
+                                    KEYS, as_obj=False, id=('in', ids))
+        self.assertEqual(second, dblib.select_page(
+            Request, 2, 2, ('id',), KEYS, as_obj=False, id=('in', ids)))
+
+    def test_as_obj(self):
+        ids = _insert('obj-', [300.0])
+        rows = dblib.select_after(Request, None, 1, keys=KEYS, id=('in', ids))
+        self.assertEqual(rows[0].id, ids[0])
+        self.assertEqual(rows[0].hreq_at, 300.0)
+
+
+class TestCount(TestCase):
+    def test_cached(self):
+        ids = _insert('count-', [400.0, 401.0])
+        ids.append('count-new')
+        self.assertEqual(dblib.count(Request, id=('in', ids)), 2)
+        dblib.insert(Request('count-new', CoS(1, 'best-effort'), b'data'))
+        self.assertEqual(dblib.count(Request, id=('in', ids)), 2)
+        self.assertEqual(dblib.count(Request, max_age=0, id=('in', ids)), 3)
+        # the fresh count is cached in turn
+        self.assertEqual(dblib.count(Request, id=('in', ids)), 3)
+
+    def test_filters(self):
+        ids = _insert('filter-', [500.0, 501.0])
+        self.assertEqual(dblib.count(Request, id=('in', ids)), 2)
+        self.assertEqual(dblib.count(Request, id=('=', ids[0])), 1)
+
+    def test_model_default(self):
+        ids = _insert('model-', [600.0])
+        ids.append('model-new')
+        self.assertEqual(Request.count(id=('in', ids)), 1)
+        dblib.insert(Request('model-new', CoS(1, 'best-effort'), b'data'))
+        # cached for dblib.COUNT_MAX_AGE
+        self.assertEqual(Request.count(id=('in', ids)), 1)
+        self.assertEqual(Request.count(max_age=0, id=('in', ids)), 2)
+
+
+if __name__ == '__main__':
+    main()
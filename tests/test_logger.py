@@ -0,0 +1,47 @@
+from unittest import TestCase, main
+from logging import Formatter, getLogger, INFO
+from io import StringIO
+
+from .context import client
+
+from logger import _ConsoleHandler, CONSOLE_FORMAT
+
+
+class TestConsoleHandler(TestCase):
+    def setUp(self):
+        self.stream = StringIO()
+        self.handler = _ConsoleHandler(self.stream)
+        self.handler.setFormatter(Formatter(CONSOLE_FORMAT))
+        self.logger = getLogger('fog_client_test')
+        self.logger.setLevel(INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def _record(self, *args, **kwargs):
+        return self.logger.makeRecord(self.logger.name, INFO, __file__, 1,
+                                      *args, **kwargs)
+
+    def test_same_as_formatter(self):
+        self.logger.info('sent %s (%d%%)', 'request', 50)
+        record = self._record('sent %s (%d%%)', ('request', 50), None)
+        self.assertEqual(self.stream.getvalue(),
+                         Formatter(CONSOLE_FORMAT).format(record) + '\n')
+        self.assertEqual(self.stream.getvalue(),
+                         ' *** INFO in test_logger - sent request (50%)\n')
+
+    def test_exception(self):
+        # records with exception info go through the formatter
+        try:
+            raise ValueError('invalid')
+        except ValueError:
+            self.logger.exception('failed')
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(lines[0], ' *** ERROR in test_logger - failed')
+        self.assertEqual(lines[-1], 'ValueError: invalid')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+from unittest import TestCase, main
+from unittest.mock import patch
+from threading import Event
+
+from .context import client
+
+from manager import (Manager, RETRY_MIN_WAIT, RETRY_FAST_ATTEMPTS,
+                     RETRY_MAX_WAIT, SPECS_DELTAS)
+from consts import MODE_CLIENT
+
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        self.manager = Manager()
+        self.manager.node = None
+        self.manager._mode = MODE_CLIENT
+
+    def tearDown(self):
+        self._disconnect()
+
+    def _disconnect(self):
+        with patch('api.delete_iperf3_listeners'), patch('api.close'):
+            self.manager.disconnect()
+
+    def _task(self, name: str, period: float, runs: list, done: Event,
+              times: int):
+        for _ in range(times):
+            runs.append(name)
+            yield period
+        done.set()
+
+    def test_periods(self):
+        runs = []
+        fast_done = Event()
+        slow_done = Event()
+        self.manager._schedule(self._task('slow', 0.2, runs, slow_done, 2))
+        self.manager._schedule(self._task('fast', 0.05, runs, fast_done, 5))
+        self.assertTrue(fast_done.wait(2))
+        self.assertTrue(slow_done.wait(2))
+        # the fast task runs in between runs of the slow one
+        self.assertEqual(runs.count('fast'), 5)
+        self.assertEqual(runs.count('slow'), 2)
+        self.assertLess(runs.index('fast', 2), runs.index('slow', 1))
+
+    def test_not_daemon(self):
+        self.manager._schedule(self._task('task', 1, [], Event(), 1))
+        self.assertFalse(self.manager._scheduler.daemon)
+
+    def test_reconnect(self):
+        runs = []
+        self.manager._schedule(self._task('old', 0.05, runs, Event(), 100))
+        old = self.manager._scheduler
+        self._disconnect()
+        # a task scheduled right away gets a new scheduler
+        done = Event()
+        self.manager._schedule(self._task('new', 0.05, runs, done, 1))
+        self.assertIsNot(self.manager._scheduler, old)
+        self.assertTrue(done.wait(2))
+        old.join(2)
+        self.assertFalse(old.is_alive())
+
+
+class TestRetry(TestCase):
+    def _delays(self, retries: int):
+        return [Manager()._retry_delay(retries) for _ in range(50)]
+
+    def test_fast(self):
+        for retries in range(RETRY_FAST_ATTEMPTS):
+            for delay in self._delays(retries):
+                self.assertTrue(RETRY_MIN_WAIT * 0.8 <= delay
+                                <= RETRY_MIN_WAIT * 1.2)
+
+    def test_exponential(self):
+        for n in range(1, 4):
+            wait = RETRY_MIN_WAIT * 2 ** n
+            for delay in self._delays(RETRY_FAST_ATTEMPTS - 1 + n):
+                self.assertTrue(wait * 0.8 <= delay <= wait * 1.2)
+
+    def test_max(self):
+        # (no overflow however many retries)
+        for retries in (100, 10 ** 6):
+            for delay in self._delays(retries):
+                self.assertTrue(RETRY_MAX_WAIT * 0.8 <= delay
+                                <= RETRY_MAX_WAIT * 1.2)
+
+    def test_jitter(self):
+        self.assertGreater(len(set(self._delays(RETRY_FAST_ATTEMPTS))), 1)
+
+
+class TestSpecsChanged(TestCase):
+    def _specs(self, cpu_free: float = 1.0, bandwidth_up: float = 10.0):
+        return {
+            'cpu_free': cpu_free,
+            'memory_free': 1024.0,
+            'disk_free': 10.0,
+            'eth0': {
+                'capacity': 100.0,
+                'bandwidth_up': bandwidth_up,
+                'bandwidth_down': None,
+            }
+        }
+
+    def _changed(self, old: dict, new: dict):
+        return Manager()._specs_changed(old, new)
+
+    def test_first(self):
+        self.assertTrue(self._changed(None, self._specs()))
+
+    def test_within_deltas(self):
+        old = self._specs()
+        new = self._specs(1.0 + SPECS_DELTAS['cpu_free'] / 2,
+                          10.0 - SPECS_DELTAS['bandwidth_up'] / 2)
+        self.assertFalse(self._changed(old, new))
+
+    def test_beyond_deltas(self):
+        old = self._specs()
+        self.assertTrue(self._changed(old, self._specs(
+            cpu_free=1.0 + SPECS_DELTAS['cpu_free'] * 2)))
+        # in nested interface specs
+        self.assertTrue(self._changed(old, self._specs(
+            bandwidth_up=10.0 + SPECS_DELTAS['bandwidth_up'] * 2)))
+
+    def test_none(self):
+        old = self._specs()
+        new = self._specs()
+        new['eth0']['bandwidth_down'] = 0.0
+        self.assertTrue(self._changed(old, new))
+        self.assertFalse(self._changed(old, self._specs()))
+
+    def test_interfaces(self):
+        new = self._specs()
+        new['eth1'] = new['eth0']
+        self.assertTrue(self._changed(self._specs(), new))
+
+
+if __name__ == '__main__':
+    main()
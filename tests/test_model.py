@@ -0,0 +1,62 @@
+from unittest import TestCase, main
+
+from .context import client
+
+from model import Request, CoS, CoSSpecs, Interface, InterfaceSpecs
+
+
+class TestAsDict(TestCase):
+    def test_slots(self):
+        specs = CoSSpecs(min_cpu=2.0)
+        d = specs.as_dict()
+        self.assertEqual(list(d), list(CoSSpecs.__slots__))
+        self.assertEqual(d['min_cpu'], 2.0)
+
+    def test_nested_slots(self):
+        iface = Interface('eth0', 1, specs=InterfaceSpecs(capacity=10.0))
+        d = iface.as_dict()
+        self.assertEqual(d['name'], 'eth0')
+        self.assertEqual(d['specs']['capacity'], 10.0)
+        d['specs']['capacity'] = 0.0
+        self.assertEqual(iface.get_capacity(), 10.0)
+
+    def test_nested(self):
+        req = Request('dict-0', CoS(1, 'best-effort', CoSSpecs(min_ram=1.0)),
+                      b'data', hreq_at=1.0)
+        req.new_attempt()
+        d = req.as_dict()
+        self.assertEqual(d['cos']['name'], 'best-effort')
+        self.assertEqual(d['cos']['specs']['min_ram'], 1.0)
+        self.assertEqual(d['attempts'][1]['attempt_no'], 1)
+        self.assertEqual(d['hreq_at'], 1.0)
+
+    def test_flat(self):
+        req = Request('dict-1', CoS(1, 'best-effort', CoSSpecs(min_ram=1.0)),
+                      b'data')
+        req.new_attempt()
+        d = req.as_dict(flat=True)
+        self.assertEqual(d['id'], 'dict-1')
+        self.assertEqual(d['cos_id'], 1)
+        self.assertEqual(d['cos_specs_min_ram'], 1.0)
+        self.assertEqual(d['attempts_1_attempt_no'], 1)
+        self.assertNotIn('cos', d)
+        self.assertNotIn('attempts', d)
+
+    def test_flat_slots(self):
+        iface = Interface('eth0', 1, specs=InterfaceSpecs(capacity=10.0))
+        d = iface.as_dict(flat=True, _prefix='interfaces_eth0')
+        self.assertEqual(d['interfaces_eth0_name'], 'eth0')
+        self.assertEqual(d['interfaces_eth0_specs_capacity'], 10.0)
+        self.assertNotIn('interfaces_eth0_specs', d)
+
+    def test_flat_snapshot(self):
+        req = Request('dict-2', CoS(1, 'best-effort'), b'data')
+        d = req.as_dict(flat=True)
+        req.new_attempt()
+        req.cos.set_min_cpu(4.0)
+        self.assertNotIn('attempts_1_attempt_no', d)
+        self.assertEqual(d['cos_specs_min_cpu'], 0.0)
+
+
+if __name__ == '__main__':
+    main()
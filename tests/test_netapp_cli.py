@@ -0,0 +1,99 @@
+from unittest import TestCase, main
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Event
+from io import StringIO
+from time import sleep
+from os import pipe, write, close
+
+from .context import client
+
+import netapp_cli
+
+
+COS_NAMES = {1: 'best-effort', 2: 'cpu-bound'}
+
+
+class TestSend(TestCase):
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.release = Event()
+        self.sent = []
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown(wait=True)
+
+    def _send_request(self, cos_id: int, data: bytes):
+        self.sent.append((cos_id, data))
+        if cos_id == 2:
+            self.release.wait(2)
+        return 'request ' + str(cos_id)
+
+    def test_not_held_up(self):
+        # a request typed while a slow one is in flight is sent (and its
+        # result printed) right away
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            slow = netapp_cli._send(self._send_request, COS_NAMES, self.pool,
+                                    2)
+            fast = netapp_cli._send(self._send_request, COS_NAMES, self.pool,
+                                    1)
+            self.assertEqual(fast.result(2), 'request 1')
+            # (printed by the done callback, right after the result is set)
+            for _ in range(20):
+                if 'request 1' in out.getvalue():
+                    break
+                sleep(0.05)
+            self.assertFalse(slow.done())
+            self.assertIn('request 1', out.getvalue())
+            self.assertNotIn('request 2', out.getvalue())
+            self.release.set()
+            slow.result(2)
+        self.assertEqual(self.sent, [(2, netapp_cli.PAYLOAD),
+                                     (1, netapp_cli.PAYLOAD)])
+
+    def test_failed(self):
+        def send_request(cos_id: int, data: bytes):
+            raise ConnectionError
+
+        with patch('sys.stdout', new_callable=StringIO), \
+                patch.object(netapp_cli.console, 'error') as error, \
+                patch.object(netapp_cli.file, 'exception'):
+            future = netapp_cli._send(send_request, COS_NAMES, self.pool, 1)
+            self.assertRaises(ConnectionError, future.result, 2)
+            self.pool.shutdown(wait=True)
+        error.assert_called_once()
+
+
+class TestStdin(TestCase):
+    def test_eof(self):
+        sent = []
+        done = Event()
+
+        def send_request(cos_id: int, data: bytes):
+            sent.append(cos_id)
+            if len(sent) == 2:
+                done.set()
+            return 'request ' + str(cos_id)
+
+        read_end, write_end = pipe()
+        stdin = patch.object(netapp_cli, 'stdin')
+        with stdin as mock, patch('sys.stdout', new_callable=StringIO):
+            mock.fileno.return_value = read_end
+            cli = Thread(target=netapp_cli.netapp_cli,
+                         args=('client', send_request, COS_NAMES),
+                         daemon=True)
+            cli.start()
+            # the last line has no line break
+            write(write_end, b'2\n3\n1')
+            close(write_end)
+            self.assertTrue(done.wait(2))
+            # the CLI keeps running once stdin is closed
+            cli.join(0.2)
+            self.assertTrue(cli.is_alive())
+        close(read_end)
+        self.assertEqual(sorted(sent), [1, 2])
+
+
+if __name__ == '__main__':
+    main()
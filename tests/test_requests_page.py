@@ -0,0 +1,63 @@
+from unittest import TestCase, main
+from unittest.mock import patch
+from importlib.util import spec_from_file_location, module_from_spec
+from datetime import datetime
+from os.path import join
+
+from .context import client
+
+from model import Request, CoS
+from consts import DRES, HREQ
+
+
+# the page is loaded on its own (dash only allows registering it from the
+# pages folder of an app)
+def _load_page():
+    spec = spec_from_file_location('requests_page', join(
+        client.__path__[0], 'gui', 'pages', 'requests.py'))
+    page = module_from_spec(spec)
+    with patch('dash.register_page'):
+        spec.loader.exec_module(page)
+    return page
+
+
+class TestGetData(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.page = _load_page()
+        cos = CoS(1, 'best-effort')
+        # earliest requests, so they are on the first page
+        Request('page-done', cos, b'data', b'result', state=DRES,
+                hreq_at=1.0, dres_at=1.5).insert()
+        Request('page-pending', cos, b'data', state=HREQ,
+                hreq_at=2.0).insert()
+
+    def _records(self):
+        records, _ = self.page.get_data(1, refresh=True)
+        return {record['ID']: record for record in records}
+
+    def test_finished(self):
+        record = self._records()['page-done']
+        self.assertEqual(record['Start'], datetime.fromtimestamp(1.0))
+        self.assertEqual(record['Finish'], datetime.fromtimestamp(1.5))
+        self.assertEqual(record['Time (ms)'], 500.0)
+        self.assertEqual(record['Data'], 'data')
+        self.assertEqual(record['Result'], 'result')
+        self.assertEqual(record['CoS'], 'best-effort')
+
+    def test_missing_values(self):
+        # null finish times are NaN next to the numbers of finished requests
+        record = self._records()['page-pending']
+        self.assertEqual(record['Start'], datetime.fromtimestamp(2.0))
+        self.assertIsNone(record['Finish'])
+        self.assertIsNone(record['Time (ms)'])
+        self.assertIsNone(record['Result'])
+
+    def test_page_count(self):
+        _, count = self.page.get_data(1, refresh=True)
+        self.assertEqual(count, -(-Request.count(max_age=0)
+                                  // self.page.PAGE_SIZE))
+
+
+if __name__ == '__main__':
+    main()